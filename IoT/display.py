@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """
 Drowsiness → Arduino bridge
-Every 3 sec: read JSON → extract sleep_percentage → smooth → send Pxxx
+On every status change: read shared memory (or JSON) → extract sleep_percentage → smooth → send Pxxx
+Change checks are a memory read / stat every POLL_SEC, so added latency is bounded by it;
+serial writes are rate limited to MAX_WRITES_PER_SEC.
 """
 
 import serial, time, json, sys, argparse, logging
@@ -16,16 +18,26 @@ SCRIPT_DIR = Path(__file__).resolve().parent
 
 # Go up one level (..) from IO and into JSON
 JSON_SUBDIR = SCRIPT_DIR.parent / 'JSON'
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+from status_channel import StatusChannelReader, channel_name
+from status_store import atomic_write_json
 JSON_FILE = JSON_SUBDIR / 'sleep_detection_data.json'
+METRICS_FILE = JSON_SUBDIR / 'display_metrics.json'  # scraped by web/app.py /metrics
+METRICS_EVERY_SEC = 1.0
 BAUD_RATE = 9600
-POLL_SEC= 3.0 # ← 3-second cycle
+POLL_SEC = 0.02  # ← max added latency between a status change and reacting to it
+MAX_WRITES_PER_SEC = 20.0  # serial rate limit ("Pxxx" is ~4 ms on the wire at 9600 baud)
 SMOOTHING_ALPHA = 0.7
+DRIVER_ID = 'driver1'  # vehicle whose status drives the LEDs (sleep_detector VEHICLE_INFO["id"])
 
 
 log = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO,
                     format="%(asctime)s %(levelname)s %(message)s")
 
+# Detector's shared-memory status segment for DRIVER_ID; the JSON file is only a fallback
+status_reader = StatusChannelReader(channel_name(DRIVER_ID))
+
 # ------------------------------------------------------------------
 def find_arduino_port() -> Optional[str]:
     """Auto-detect Arduino port."""
@@ -54,9 +66,15 @@ def open_serial(port: Optional[str]) -> serial.Serial:
 # ------------------------------------------------------------------
 def load_sleep_percentage() -> int:
     """
-    Read JSON, extract 'sleep_percentage' from first valid driver.
-    Returns 0 if missing or invalid.
+    Read the shared-memory channel (or JSON as fallback), extract 'sleep_percentage'
+    from DRIVER_ID's entry, else the first valid driver. Returns 0 if missing or invalid.
     """
+    entry = status_reader.read()
+    if entry is not None:
+        pct = min(max(float(entry['sleep_percentage']), 0), 100)
+        log.debug(f"Shared memory sleep_percentage = {pct}% | Status: {entry['status'].lower()} | From {entry['id']}")
+        return round(pct)
+
     # FIX 2A: Use the corrected JSON_FILE path check
     if not JSON_FILE.is_file():
         # Only log a warning if the file is genuinely missing
@@ -80,6 +98,8 @@ def load_sleep_percentage() -> int:
         log.warning("JSON root is not list or dict")
         return 0
 
+    # This driver's entry first, then the others in file order
+    data = sorted(data, key=lambda v: not (isinstance(v, dict) and v.get('id') == DRIVER_ID))
     for v in data:
         if not isinstance(v, dict):
             continue
@@ -103,6 +123,28 @@ def load_sleep_percentage() -> int:
     return 0
 # ------------------------------------------------------------------
 
+# ------------------------------------------------------------------
+def read_source_version():
+    """Cheap change marker: shared-memory (generation, sequence), else JSON (mtime, size); None if missing"""
+    version = status_reader.version()
+    if version is not None and version[1]:
+        return ('shm', version)
+    try:
+        st = JSON_FILE.stat()
+    except FileNotFoundError:
+        return None
+    return ('file', st.st_mtime_ns, st.st_size)
+
+# ------------------------------------------------------------------
+def write_metrics(metrics: dict):
+    """Publish the bridge's counters for the dashboard; failures are only logged"""
+    metrics['timestamp'] = time.time()
+    try:
+        JSON_SUBDIR.mkdir(exist_ok=True)
+        atomic_write_json(METRICS_FILE, metrics, fsync=False)  # rewritten every second, only read live
+    except OSError as e:
+        log.debug(f"Metrics write failed: {e}")
+
 # ------------------------------------------------------------------
 def format_cmd(pct: int) -> bytes:
     return f"P{pct:03d}".encode('ascii')
@@ -111,35 +153,49 @@ def format_cmd(pct: int) -> bytes:
 def main(port_arg: Optional[str]):
     ser = open_serial(port_arg)
     displayed = 0
+    current_pct = 0
     last_sent = -1
+    last_version = object()  # never equal to a real version → first pass always reads
+    last_write = 0.0
+    min_write_gap = 1.0 / MAX_WRITES_PER_SEC
+    metrics = {'serial_writes': 0, 'serial_bytes': 0, 'source_reads': 0,
+               'raw_percentage': 0, 'displayed_percentage': 0}
+    next_metrics = 0.0
 
-    log.info(f"Starting 3-second JSON read cycle (Ctrl-C to quit)")
+    log.info(f"Watching for status changes every {POLL_SEC * 1000:.0f} ms (Ctrl-C to quit)")
 
     try:
         while True:
-            start_time = time.time()
-
-            # === 1. READ JSON ONCE ===
-            current_pct = load_sleep_percentage()  # ← temp variable
-
-            # === 2. SMOOTH & SEND ===
-            displayed = int(round(displayed + SMOOTHING_ALPHA * (current_pct - displayed)))
-
-            if displayed != last_sent:
+            # === 1. READ ONLY WHEN THE SOURCE CHANGED ===
+            version = read_source_version()
+            if version != last_version:
+                last_version = version
+                current_pct = load_sleep_percentage()
+                metrics['source_reads'] += 1
+                # Smooth per new reading, not per tick
+                displayed = int(round(displayed + SMOOTHING_ALPHA * (current_pct - displayed)))
+
+            # === 2. SEND (RATE LIMITED) ===
+            now = time.monotonic()
+            if displayed != last_sent and now - last_write >= min_write_gap:
                 cmd = format_cmd(displayed)
                 ser.write(cmd)
                 ser.flush()
                 level = round(displayed / 100 * 7)
                 log.info(f"Raw:{current_pct:3d}% → Disp:{displayed:3d}%  Lvl:{level}/7  → {cmd!r}")
                 last_sent = displayed
-            else:
-                log.debug(f"No change → still {displayed}%")
+                last_write = now
+                metrics['serial_writes'] += 1
+                metrics['serial_bytes'] += len(cmd)
+
+            if now >= next_metrics:
+                metrics['raw_percentage'] = current_pct
+                metrics['displayed_percentage'] = displayed
+                write_metrics(metrics)
+                next_metrics = now + METRICS_EVERY_SEC
 
-            # === 3. WAIT ~3 SECONDS ===
-            elapsed = time.time() - start_time
-            remaining = POLL_SEC - elapsed
-            if remaining > 0:
-                time.sleep(remaining)
+            # === 3. WAIT FOR THE NEXT CHECK ===
+            time.sleep(POLL_SEC)
 
     except KeyboardInterrupt:
         log.info("Shutting down...")
@@ -154,10 +210,18 @@ def main(port_arg: Optional[str]):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Drowsiness → Arduino bridge")
     parser.add_argument('-p', '--port', help='Serial port (e.g. COM3)')
+    parser.add_argument('--driver', default=DRIVER_ID,
+                        help='Vehicle id to display (default: %(default)s)')
     parser.add_argument('--poll', type=float, default=POLL_SEC,
-                        help='Polling interval in seconds (default: 3.0)')
+                        help='Max seconds between a status change and reacting to it (default: 0.02)')
+    parser.add_argument('--max-rate', type=float, default=MAX_WRITES_PER_SEC,
+                        help='Max serial writes per second (default: 20)')
     args = parser.parse_args()
 
     POLL_SEC = args.poll  # ← no global needed
+    MAX_WRITES_PER_SEC = args.max_rate
+    if args.driver != DRIVER_ID:
+        DRIVER_ID = args.driver
+        status_reader = StatusChannelReader(channel_name(DRIVER_ID))
 
     main(args.port)
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Adaptive Face Mesh scheduling for the live detector
+Crops inference to a padded ROI around the last face, downsizes large faces, and runs
+Face Mesh on fewer frames while the driver is stably active with eyes well open.
+The rate goes back to every frame as soon as EAR nears the threshold or the face is lost.
+"""
+
+import cv2
+import numpy as np
+
+from drowsiness_engine import STATUS_ACTIVE
+
+
+class AdaptiveScheduler:
+    """
+    Shared by the inference thread (should_infer / prepare) and the render thread (observe).
+    Plain attribute writes only, so no lock is needed between the two.
+    """
+
+    def __init__(self, max_stride=3, stable_frames=15, ear_margin=0.08,
+                 roi_padding=0.5, max_roi_side=320):
+        self.max_stride = max_stride          # infer 1 of every max_stride frames when safe
+        self.stable_frames = stable_frames    # consecutive active frames before slowing down
+        self.ear_margin = ear_margin          # EAR headroom above the threshold that counts as safe
+        self.roi_padding = roi_padding        # ROI padding as a fraction of the face box size
+        self.max_roi_side = max_roi_side      # larger crops are downsized to this many pixels
+        self.stride = 1
+        self.bbox = None        # last face box (x_min, y_min, x_max, y_max), full-frame pixels
+        self._active_run = 0
+        self.roi = None         # current crop (x0, y0, x1, y1); kept while the face stays inside
+        self._since_infer = 0
+        self.inferred = 0
+        self.skipped = 0
+
+    # --- render thread ---
+
+    def observe(self, ear, threshold, status, bbox):
+        """Feed back the latest analysis; bbox=None when no face was found"""
+        self.bbox = bbox
+        if bbox is None:
+            self._active_run = 0
+            self.stride = 1
+            return
+        self._active_run = self._active_run + 1 if status == STATUS_ACTIVE else 0
+        headroom = ear - threshold
+        if self._active_run < self.stable_frames or headroom < self.ear_margin:
+            self.stride = 1
+        elif headroom < 2 * self.ear_margin:
+            self.stride = min(2, self.max_stride)
+        else:
+            self.stride = self.max_stride
+
+    # --- inference thread ---
+
+    def should_infer(self):
+        """False on frames that can reuse the previous Face Mesh result"""
+        self._since_infer += 1
+        if self._since_infer < self.stride:
+            self.skipped += 1
+            return False
+        self._since_infer = 0
+        self.inferred += 1
+        return True
+
+    def _roi_for(self, bbox, w, h):
+        x_min, y_min, x_max, y_max = bbox
+        pad_x = int((x_max - x_min) * self.roi_padding)
+        pad_y = int((y_max - y_min) * self.roi_padding)
+        return (max(0, x_min - pad_x), max(0, y_min - pad_y),
+                min(w, x_max + pad_x), min(h, y_max + pad_y))
+
+    def _keeps(self, bbox, w, h):
+        """
+        The current ROI still fits: face inside its inner margin and not much smaller.
+        A sticky ROI keeps Face Mesh's own frame-to-frame tracking in one coordinate frame.
+        """
+        x0, y0, x1, y1 = self.roi
+        x_min, y_min, x_max, y_max = bbox
+        margin_x = (x1 - x0) * 0.1
+        margin_y = (y1 - y0) * 0.1
+        # Edges clamped to the frame can't move further out, so they don't count
+        inside = (x_min >= x0 + margin_x or x0 == 0) and (y_min >= y0 + margin_y or y0 == 0) \
+            and (x_max <= x1 - margin_x or x1 == w) and (y_max <= y1 - margin_y or y1 == h)
+        return inside and (x_max - x_min) * 3 > (x1 - x0)
+
+    def prepare(self, rgb_frame):
+        """(image to run Face Mesh on, roi) — roi is (x0, y0, roi_w, roi_h) or None for the full frame"""
+        bbox = self.bbox
+        if bbox is None:
+            self.roi = None
+            return rgb_frame, None
+
+        h, w = rgb_frame.shape[:2]
+        if self.roi is None or not self._keeps(bbox, w, h):
+            self.roi = self._roi_for(bbox, w, h)
+        x0, y0, x1, y1 = self.roi
+        roi_w, roi_h = x1 - x0, y1 - y0
+        if roi_w < 32 or roi_h < 32:
+            self.roi = None
+            return rgb_frame, None
+
+        crop = rgb_frame[y0:y1, x0:x1]
+        scale = self.max_roi_side / max(roi_w, roi_h)
+        if scale < 1.0:
+            # Landmarks are normalized to the crop, so downsizing needs no extra remapping
+            crop = cv2.resize(crop, (int(roi_w * scale), int(roi_h * scale)),
+                              interpolation=cv2.INTER_AREA)
+        else:
+            crop = np.ascontiguousarray(crop)  # Face Mesh needs a contiguous buffer
+        return crop, (x0, y0, roi_w, roi_h)
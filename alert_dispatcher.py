@@ -0,0 +1,208 @@
+"""
+Drowsiness alert dispatcher
+One long-lived thread delivers alerts to pluggable sinks (console, audio, serial, HTTP);
+network sinks hand off to a thread of their own, so they can't hold up the local ones.
+The frame loop only calls alert()/clear(): an attribute check and, at most a few times per
+episode, a put on a bounded drop-oldest queue, so alerting never creates threads or blocks.
+An alert episode escalates with its duration and repeats at most once per cooldown.
+"""
+
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from latest_queue import LatestQueue
+
+log = logging.getLogger(__name__)
+
+LEVEL_NAMES = {0: "cleared", 1: "warning", 2: "alarm", 3: "critical"}
+# Seconds of continuous sleep before each level (level 1 fires immediately)
+DEFAULT_ESCALATION_SEC = (0.0, 5.0, 10.0)
+
+
+class ConsoleSink:
+    """Prints alerts through the detector's logger / print function"""
+
+    def __init__(self, write=print):
+        self.write = write
+
+    def send(self, alert):
+        if alert["level"]:
+            self.write(f"ALERT ({alert['name']}): Wake up! [{alert['episode_sec']:.0f}s]")
+        else:
+            self.write("ALERT cleared")
+
+
+class AudioSink:
+    """Beeps through sounddevice (optional dependency); higher levels are higher and longer"""
+
+    FREQUENCIES = {1: 880.0, 2: 1320.0, 3: 1760.0}
+
+    def __init__(self, sample_rate=44100, volume=0.5):
+        self.sample_rate = sample_rate
+        self.volume = volume
+        self._sd = None
+        self._tones = {}
+        try:
+            import numpy as np
+            import sounddevice
+        except (ImportError, OSError) as e:
+            log.warning(f"Audio alerts disabled: {e}")
+            return
+        self._sd = sounddevice
+        for level, freq in self.FREQUENCIES.items():
+            t = np.arange(int(sample_rate * 0.25 * level)) / sample_rate
+            self._tones[level] = (volume * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+    def send(self, alert):
+        if self._sd is None:
+            return
+        if alert["level"]:
+            self._sd.play(self._tones[alert["level"]], self.sample_rate)  # returns immediately
+        else:
+            self._sd.stop()
+
+
+class SerialSink:
+    """Writes 'A<level>' lines to a buzzer / LED board (pyserial); 'A0' clears"""
+
+    def __init__(self, port, baud_rate=9600):
+        import serial
+        self._serial = serial.Serial(port, baud_rate, timeout=0.1, write_timeout=0.5)
+
+    def send(self, alert):
+        self._serial.write(f"A{alert['level']}\n".encode("ascii"))
+
+    def close(self):
+        self._serial.close()
+
+
+class HttpSink:
+    """
+    POSTs each alert as JSON (fleet dashboard, paging webhook) from its own thread, so a
+    slow or unreachable endpoint never delays the local sinks
+    """
+
+    def __init__(self, url, timeout=2.0, queue_size=8):
+        self.url = url
+        self.timeout = timeout
+        self.posts = 0
+        self.errors = 0
+        self._queue = LatestQueue(queue_size)
+        self._thread = threading.Thread(target=self._run, name="alerts-http", daemon=True)
+        self._thread.start()
+
+    @property
+    def dropped(self):
+        return self._queue.dropped
+
+    def send(self, alert):
+        self._queue.put(alert)
+
+    def _run(self):
+        while True:
+            alert = self._queue.get()
+            if alert is None:
+                break  # closed
+            request = urllib.request.Request(
+                self.url, data=json.dumps(alert).encode("utf-8"),
+                headers={"Content-Type": "application/json"}, method="POST")
+            try:
+                urllib.request.urlopen(request, timeout=self.timeout).close()
+                self.posts += 1
+            except (urllib.error.URLError, OSError) as e:
+                self.errors += 1
+                log.warning(f"Alert POST to {self.url} failed: {e}")
+
+    def close(self, timeout=2.0):
+        self._queue.close()
+        self._thread.join(timeout)
+
+
+class AlertDispatcher:
+    """Debounces, escalates and fans out alerts from a single background thread"""
+
+    def __init__(self, sinks=(), cooldown_sec=3.0, escalation_sec=DEFAULT_ESCALATION_SEC,
+                 source=None, queue_size=8):
+        self.sinks = list(sinks)
+        self.cooldown_sec = cooldown_sec        # repeat a sustained alert at most this often
+        self.escalation_sec = escalation_sec    # episode duration at which each level starts
+        self.source = source                    # e.g. vehicle id, included in every alert
+        self.sent = 0
+        self.errors = 0
+        self._episode_start = None
+        self._level = 0
+        self._last_sent = 0.0
+        self._queue = LatestQueue(queue_size)
+        self._thread = threading.Thread(target=self._run, name="alerts", daemon=True)
+        self._thread.start()
+
+    @property
+    def dropped(self):
+        return self._queue.dropped
+
+    @property
+    def active(self):
+        return self._episode_start is not None
+
+    def _level_for(self, duration):
+        level = 0
+        for i, start in enumerate(self.escalation_sec):
+            if duration >= start:
+                level = i + 1
+        return level
+
+    def _emit(self, level, timestamp):
+        self._last_sent = timestamp
+        self._queue.put({
+            "level": level,
+            "name": LEVEL_NAMES.get(level, str(level)),
+            "source": self.source,
+            "timestamp": timestamp,
+            "episode_sec": timestamp - self._episode_start if self._episode_start is not None else 0.0
+        })
+
+    def alert(self, timestamp=None):
+        """The alert condition holds this frame; queues a notification only when it is due"""
+        if timestamp is None:
+            timestamp = time.time()
+        if self._episode_start is None:
+            self._episode_start = timestamp
+        level = self._level_for(timestamp - self._episode_start)
+        if level > self._level or timestamp - self._last_sent >= self.cooldown_sec:
+            self._level = level
+            self._emit(level, timestamp)
+
+    def clear(self, timestamp=None):
+        """The condition is over; sinks get a level-0 'cleared' if anything was sent"""
+        if self._episode_start is None:
+            return
+        self._emit(0, time.time() if timestamp is None else timestamp)
+        self._episode_start = None
+        self._level = 0
+
+    def _run(self):
+        while True:
+            alert = self._queue.get()
+            if alert is None:
+                break  # closed
+            for sink in self.sinks:
+                try:
+                    sink.send(alert)
+                    self.sent += 1
+                except Exception as e:
+                    # Sinks are plugins: one broken sink (unplugged board, dashboard down)
+                    # must not silence the others or kill the dispatcher
+                    self.errors += 1
+                    log.warning(f"Alert sink {type(sink).__name__} failed: {e}")
+
+    def close(self, timeout=2.0):
+        self._queue.close()
+        self._thread.join(timeout)
+        for sink in self.sinks:
+            close = getattr(sink, "close", None)
+            if close is not None:
+                close()
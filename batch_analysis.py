@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Offline batch analysis of recorded driver footage
+Runs the detector's EAR / blink / microsleep / head-pose logic on video files as fast as
+the CPU allows (no window, no real-time pacing) and writes per-frame metrics to a
+columnar file: .npz with one array per metric (default) or .csv.
+Videos (and, with --segment-sec, time segments of long videos) run as tasks; with
+--workers N they are spread over N processes, each with its own Face Mesh. Results are
+merged in order either way.
+
+Usage: python batch_analysis.py footage/ clip.mp4 --out batch_results --workers 8 --segment-sec 600
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import detector_settings as settings
+from drowsiness_engine import STATUS_ACTIVE, STATUS_DROWSY, STATUS_SLEEPING
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm'}
+
+# Status strings are stored as small integer codes in the columnar output
+STATUS_LABELS = ["", STATUS_ACTIVE, STATUS_DROWSY, STATUS_SLEEPING]
+STATUS_CODES = {label: code for code, label in enumerate(STATUS_LABELS)}
+
+ear_threshold = settings.DEFAULT_EAR_THRESHOLD  # set from --threshold (in workers by _init_worker)
+
+COLUMNS = {
+    "frame": np.int64,
+    "time": np.float64,             # seconds from the start of the video
+    "face": np.bool_,
+    "ear": np.float32,
+    "left_ear": np.float32,
+    "right_ear": np.float32,
+    "pitch": np.float32,
+    "yaw": np.float32,
+    "roll": np.float32,
+    "status": np.int8,              # index into STATUS_LABELS
+    "sleep_percentage": np.float32,
+    "blink_duration": np.float32,   # ms the eyes have been closed so far
+    "total_blinks": np.int32,
+    "microsleep_count": np.int32,
+}
+_FACE_METRICS = ("ear", "left_ear", "right_ear", "pitch", "yaw", "roll")
+
+
+def find_videos(paths):
+    """Expand directories (recursively) into a sorted list of video files"""
+    videos = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            videos.extend(sorted(f for f in p.rglob('*') if f.suffix.lower() in VIDEO_EXTENSIONS))
+        elif p.is_file():
+            videos.append(p)
+        else:
+            print(f"Skipping {p}: not found")
+    return videos
+
+
+def record_frame(rows, index, timestamp, engine, face, blinks_base=0, microsleeps_base=0):
+    """Append the engine's state after one frame to the column lists (face: a face was seen)"""
+    rows["frame"].append(index)
+    rows["time"].append(timestamp)
+    rows["face"].append(face)
+    for name in _FACE_METRICS:
+        rows[name].append(getattr(engine, name) if face else np.nan)
+    rows["status"].append(STATUS_CODES.get(engine.status, 0))
+    rows["sleep_percentage"].append(engine.sleep_percentage)
+    rows["blink_duration"].append(engine.blink_duration)
+    rows["total_blinks"].append(engine.total_blinks - blinks_base)
+    rows["microsleep_count"].append(engine.microsleep_count - microsleeps_base)
+
+
+def to_columns(rows):
+    return {name: np.asarray(values, dtype=COLUMNS[name]) for name, values in rows.items()}
+
+
+def analyze_video(path, face_mesh=None, start_frame=0, end_frame=None, record_from=None, engine=None):
+    """
+    Process one video (or frames [start_frame, end_frame) of it); returns (columns, fps).
+    Frames before record_from are run for state warm-up only and not recorded; cumulative
+    counters (total_blinks, microsleep_count) are then relative to record_from.
+    """
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise IOError(f"Could not open video {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    if start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    if record_from is None:
+        record_from = start_frame
+
+    mesh = face_mesh or settings.create_face_mesh()
+    engine = engine or settings.create_engine(ear_threshold)
+    engine.reset(start_time=start_frame / fps)
+    rows = {name: [] for name in COLUMNS}
+    index = start_frame
+    blinks_base = microsleeps_base = 0
+
+    try:
+        while end_frame is None or index < end_frame:
+            if index == record_from:
+                blinks_base, microsleeps_base = engine.total_blinks, engine.microsleep_count
+            ret, frame = cap.read()
+            if not ret:
+                break
+            # Video time, not wall time, drives blink timing and time windows
+            timestamp = index / fps
+
+            # Same preprocessing as the live pipeline
+            frame = cv2.flip(frame, 1)
+            results = mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            h, w = frame.shape[:2]
+
+            face = bool(results.multi_face_landmarks)
+            if face:
+                engine.step(results.multi_face_landmarks[0], timestamp, w, h)
+            else:
+                engine.no_face()
+            # Overlap warm-up frames advance the state machine but are not recorded
+            if index >= record_from:
+                record_frame(rows, index, timestamp, engine, face, blinks_base, microsleeps_base)
+            index += 1
+    finally:
+        cap.release()
+        if face_mesh is None:
+            mesh.close()
+
+    return to_columns(rows), fps
+
+
+# --- Multi-process runner ---
+
+def plan_tasks(videos, segment_sec=None, overlap_sec=10.0):
+    """
+    (video index, path, start_frame, end_frame, record_from) tasks in output order.
+    Long videos are cut into segment_sec pieces; each piece starts overlap_sec early so
+    its blink/status state has settled by the time recording begins.
+    """
+    tasks = []
+    for i, video in enumerate(videos):
+        if not segment_sec:
+            tasks.append((i, video, 0, None, 0))
+            continue
+        cap = cv2.VideoCapture(str(video))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        seg, overlap = int(segment_sec * fps), int(overlap_sec * fps)
+        if total <= 0 or total <= seg:
+            tasks.append((i, video, 0, None, 0))
+            continue
+        for record_from in range(0, total, seg):
+            end = record_from + seg if record_from + seg < total else None  # last one reads to EOF
+            tasks.append((i, video, max(0, record_from - overlap), end, record_from))
+    return tasks
+
+
+def _init_worker(threshold):
+    global ear_threshold
+    ear_threshold = threshold
+
+
+def _run_task(task):
+    i, video, start, end, record_from = task
+    began = time.perf_counter()
+    try:
+        columns, fps = analyze_video(video, start_frame=start, end_frame=end, record_from=record_from)
+    except IOError as e:
+        return i, None, None, str(e), 0.0
+    return i, columns, fps, None, time.perf_counter() - began
+
+
+def merge_segments(parts):
+    """Concatenate per-segment columns in order, carrying cumulative counters across"""
+    merged = {}
+    for name in COLUMNS:
+        arrays = []
+        offset = 0
+        for part in parts:
+            col = part[name]
+            if name in ("total_blinks", "microsleep_count"):
+                col = col + offset
+                offset = col[-1] if len(col) else offset
+            arrays.append(col)
+        merged[name] = np.concatenate(arrays) if arrays else np.array([], dtype=COLUMNS[name])
+    return merged
+
+
+def run_tasks(videos, out_dir, fmt, threshold, workers=1, segment_sec=None, overlap_sec=10.0):
+    """
+    Run the planned tasks, sharded over a process pool when workers > 1 and in this
+    process otherwise, and write each video's merged metrics in order
+    """
+    tasks = plan_tasks(videos, segment_sec, overlap_sec)
+    remaining = {}
+    for task in tasks:
+        remaining[task[0]] = remaining.get(task[0], 0) + 1
+    parts, cpu_time, used = {}, {}, set()
+    start = time.perf_counter()
+    total_frames = 0
+
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(threshold,))
+    else:
+        _init_worker(threshold)
+    try:
+        # imap keeps task order, so segments of one video arrive in sequence
+        results = pool.imap(_run_task, tasks) if pool is not None else map(_run_task, tasks)
+        for i, columns, fps, error, elapsed in results:
+            remaining[i] -= 1
+            if error:
+                print(f"Error: {error}")
+                parts[i] = None  # a video with a failed segment is not written
+            elif parts.get(i, []) is not None:
+                parts.setdefault(i, []).append(columns)
+                cpu_time[i] = cpu_time.get(i, 0.0) + elapsed
+            if remaining[i]:
+                continue
+
+            video_parts = parts.pop(i, None)
+            if not video_parts:
+                continue
+            merged = merge_segments(video_parts)
+            total_frames += len(merged["frame"])
+            summarize(videos[i], merged, fps, cpu_time.pop(i))
+            print(f"  → {save_metrics(merged, output_path(videos[i], out_dir, used), fps, fmt)}")
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    wall = time.perf_counter() - start
+    print(f"{len(videos)} videos, {total_frames} frames in {wall:.1f}s "
+          f"with {workers} workers [{total_frames / wall if wall else 0:.0f} fps overall]")
+
+
+def save_metrics(columns, out_path, fps, fmt="npz"):
+    """Write metrics columns to out_path (.npz or .csv); returns the path written"""
+    out_path = Path(out_path).with_suffix('.' + fmt)
+    if fmt == "npz":
+        np.savez_compressed(out_path, fps=np.float64(fps),
+                            status_labels=np.array(STATUS_LABELS), **columns)
+    else:
+        with open(out_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(list(columns))
+            for row in zip(*columns.values()):
+                writer.writerow([STATUS_LABELS[v] if name == "status" else v
+                                 for name, v in zip(columns, row)])
+    return out_path
+
+
+def output_path(video, out_dir, used):
+    """<stem>_metrics, de-duplicated when two inputs share a file name"""
+    stem = f"{video.stem}_metrics"
+    name, n = stem, 1
+    while name in used:
+        n += 1
+        name = f"{stem}_{n}"
+    used.add(name)
+    return Path(out_dir) / name
+
+
+def summarize(video, columns, fps, elapsed):
+    frames = len(columns["frame"])
+    sleeping = np.count_nonzero(columns["status"] == STATUS_CODES[STATUS_SLEEPING])
+    microsleeps = int(columns["microsleep_count"][-1]) if frames else 0
+    speed = frames / elapsed if elapsed > 0 else 0
+    print(f"{video}: {frames} frames ({frames / fps / 60:.1f} min) in {elapsed:.1f}s "
+          f"[{speed:.0f} fps, {speed / fps:.1f}x real time] | "
+          f"sleeping {100 * sleeping / max(frames, 1):.1f}% | microsleeps {microsleeps}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline batch analysis of driver footage")
+    parser.add_argument('inputs', nargs='+', help='Video files or directories')
+    parser.add_argument('-o', '--out', default='batch_results', help='Output directory')
+    parser.add_argument('--format', choices=('npz', 'csv'), default='npz')
+    parser.add_argument('--threshold', type=float, default=settings.DEFAULT_EAR_THRESHOLD,
+                        help='EAR threshold (default: %(default)s)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='Worker processes, each with its own Face Mesh (0 = all cores)')
+    parser.add_argument('--segment-sec', type=float, default=None,
+                        help='Split long videos into segments of this many seconds')
+    parser.add_argument('--overlap-sec', type=float, default=10.0,
+                        help='Warm-up overlap before each segment (default: %(default)s)')
+    args = parser.parse_args()
+
+    global ear_threshold
+    ear_threshold = args.threshold
+    videos = find_videos(args.inputs)
+    if not videos:
+        parser.error("no video files found")
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+
+    workers = args.workers or os.cpu_count() or 1
+    run_tasks(videos, args.out, args.format, args.threshold, workers, args.segment_sec, args.overlap_sec)
+
+
+if __name__ == '__main__':
+    main()
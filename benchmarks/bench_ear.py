@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-eye eye_aspect_ratio() vs batched eye_aspect_ratio_batch()
+Run from the repo root: python benchmarks/bench_ear.py --faces 1 --frames 20000
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from landmarks import eye_aspect_ratio_batch
+from sleep_detector import eye_aspect_ratio
+
+
+def make_eyes(faces, frames, seed=0):
+    """Random but plausible eye contours: (frames, faces, 2, 6, 2) pixel coords"""
+    rng = np.random.default_rng(seed)
+    base = np.array([[0, 0], [10, -4], [20, -4], [30, 0], [20, 4], [10, 4]], dtype=np.float64)
+    jitter = rng.normal(0, 0.5, size=(frames, faces, 2, 6, 2))
+    return base + jitter + 300
+
+
+def run(faces, frames, repeat):
+    eyes = make_eyes(faces, frames)
+
+    def per_eye():
+        for frame in eyes:
+            for face in frame:
+                eye_aspect_ratio(face[0])
+                eye_aspect_ratio(face[1])
+
+    def batched():
+        for frame in eyes:
+            eye_aspect_ratio_batch(frame)
+
+    # Sanity check: both paths agree
+    ref = np.array([[eye_aspect_ratio(e) for e in face] for face in eyes[0]])
+    assert np.allclose(ref, eye_aspect_ratio_batch(eyes[0]))
+
+    t_old = min(timeit.repeat(per_eye, number=1, repeat=repeat))
+    t_new = min(timeit.repeat(batched, number=1, repeat=repeat))
+    t_all = min(timeit.repeat(lambda: eye_aspect_ratio_batch(eyes), number=1, repeat=repeat))
+
+    print(f"faces={faces} frames={frames}")
+    print(f"  eye_aspect_ratio (per eye) : {t_old / frames * 1e6:8.2f} us/frame")
+    print(f"  eye_aspect_ratio_batch     : {t_new / frames * 1e6:8.2f} us/frame  ({t_old / t_new:.1f}x)")
+    print(f"  batch over whole recording : {t_all / frames * 1e6:8.2f} us/frame  ({t_old / t_all:.1f}x)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="EAR micro-benchmark")
+    parser.add_argument('--faces', type=int, default=1)
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.faces, args.frames, args.repeat)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the per-frame detection hot path
+Replays a landmark sequence (synthetic by default, or recorded with --landmarks) through
+eye_aspect_ratio, calculate_head_pose, DrowsinessEngine.update_sleep_percentage,
+update_state_history, write_vehicle_status and the whole DrowsinessEngine.step, timing every call.
+Reports ops/sec and per-call latency percentiles; --save stores a baseline and
+--compare fails (exit 1) when p95 latency regressed past --tolerance.
+
+Run from the repo root:
+  python benchmarks/bench_hot_path.py --save            # record benchmarks/baselines/<host>.json
+  python benchmarks/bench_hot_path.py --compare         # check against it before deploying
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import sleep_detector as sd
+from drowsiness_engine import STATUS_ACTIVE, STATUS_DROWSY, STATUS_SLEEPING
+from landmarks import EYES_IDX, NUM_LANDMARKS, POSE_IDX, eye_aspect_ratio_batch
+from landmark_trace import TRACE_EXTENSION, LandmarkTrace
+from status_store import StatusPublisher
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+FRAME_W, FRAME_H = 640, 480
+STATES = (STATUS_ACTIVE, STATUS_DROWSY, STATUS_SLEEPING)
+
+
+# --- Input sequences ---
+
+def synthetic_sequence(frames, fps=30.0, seed=0):
+    """
+    (frames, 468, 2) pixel landmarks: slow head motion, a blink every ~4 s and a
+    few seconds of drooping eyes every ~20 s, so every branch of the state logic runs.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames) / fps
+    points = np.empty((frames, NUM_LANDMARKS, 2), dtype=np.float64)
+    face = rng.uniform([220, 140], [420, 380], size=(NUM_LANDMARKS, 2))
+
+    # Pose points: the 3D model projected under a slowly wobbling head
+    camera = sd.camera_matrix_for(FRAME_W, FRAME_H)
+    tvec = np.array([[0.0], [0.0], [1000.0]])
+    rvecs = np.stack([0.15 * np.sin(t / 3), 0.25 * np.sin(t / 5), 0.05 * np.sin(t / 7)], axis=1)
+
+    # Eye openness: 1 open, 0 closed
+    openness = np.ones(frames)
+    openness[(t % 4.0) < 0.15] = 0.1                      # blinks
+    openness[(t % 20.0) > 17.0] = 0.55                    # drowsy stretch
+    openness[((t % 20.0) > 18.5) & ((t % 20.0) < 19.5)] = 0.1  # microsleep inside it
+    contour = np.array([[0, 0], [10, -5], [20, -5], [30, 0], [20, 5], [10, 5]], dtype=np.float64)
+    eye_origin = np.array([[270, 230], [340, 230]], dtype=np.float64)
+
+    for i in range(frames):
+        points[i] = face + rng.normal(0, 0.3, size=face.shape)
+        projected, _ = cv2.projectPoints(sd.MODEL_POINTS, rvecs[i], tvec, camera, sd.DIST_COEFFS)
+        points[i, POSE_IDX] = projected.reshape(-1, 2)
+        eye = contour * [1.0, openness[i]]
+        points[i, EYES_IDX] = eye + eye_origin[:, None, :] + rng.normal(0, 0.2, size=(2, 6, 2))
+    return points, fps
+
+
+def load_sequence(path):
+    """Recorded landmarks: a .slt trace, or .npz with 'points' (frames, N, 2) in pixels and optional 'fps'"""
+    if Path(path).suffix == TRACE_EXTENSION:
+        trace = LandmarkTrace(path)
+        points = trace.pixel_points()[trace.face]
+        # Rescale to the benchmark frame size used by the pose / face steps
+        points *= (FRAME_W / trace.width, FRAME_H / trace.height)
+        return points, trace.fps or 30.0
+    data = np.load(path)
+    return np.asarray(data["points"], dtype=np.float64), float(data["fps"]) if "fps" in data else 30.0
+
+
+def normalized_sequence(points):
+    """(frames, N, 3) normalized landmarks (z = 0), the form engine.step takes from traces"""
+    normalized = np.zeros(points.shape[:2] + (3,), dtype=np.float32)
+    normalized[..., :2] = points / (FRAME_W, FRAME_H)
+    return normalized
+
+
+def state_sequence(points, threshold):
+    """Status string per frame from EAR, the way the engine would classify it"""
+    ear = eye_aspect_ratio_batch(points[:, EYES_IDX]).mean(axis=1)
+    codes = np.where(ear < threshold, 2, np.where(ear < threshold + sd.drowsy_band, 1, 0))
+    return [STATES[c] for c in codes]
+
+
+# --- Benchmarks ---
+
+def timed(fn, args_seq):
+    """Call fn(*args) for each args tuple; returns per-call durations in microseconds"""
+    durations = np.empty(len(args_seq), dtype=np.float64)
+    clock = time.perf_counter_ns
+    for i, args in enumerate(args_seq):
+        start = clock()
+        fn(*args)
+        durations[i] = clock() - start
+    return durations / 1000.0
+
+
+def reset_state(engine):
+    engine.reset()
+    sd.state_history.clear()
+    sd.current_state = sd.current_state_start = None
+
+
+def run_suite(points, fps, tmp_dir):
+    frames = len(points)
+    eyes = points[:, EYES_IDX]
+    states = state_sequence(points, sd.current_threshold)
+    timestamps = np.arange(frames) / fps
+    engine = sd.create_engine()
+    reset_state(engine)
+
+    # write_vehicle_status goes to a scratch file, never the real JSON/ folder
+    sd.status_publisher = StatusPublisher(str(Path(tmp_dir) / "status.json"), sd.VEHICLE_INFO,
+                                          flush_interval=sd.STATUS_FLUSH_SEC,
+                                          heartbeat_interval=sd.STATUS_HEARTBEAT_SEC)
+    pct = np.linspace(0, 100, frames)
+
+    results = {
+        "eye_aspect_ratio": timed(lambda e: (sd.eye_aspect_ratio(e[0]), sd.eye_aspect_ratio(e[1])),
+                                  [(e,) for e in eyes]),
+        "eye_aspect_ratio_batch": timed(eye_aspect_ratio_batch, [(e,) for e in eyes]),
+        "calculate_head_pose": timed(sd.calculate_head_pose,
+                                     [(p[POSE_IDX], FRAME_W, FRAME_H) for p in points]),
+        "head_pose.update": timed(engine.head_pose.update,
+                                  [(p[POSE_IDX], FRAME_W, FRAME_H) for p in points]),
+        "update_sleep_percentage": timed(engine.update_sleep_percentage,
+                                         list(zip(states, timestamps))),
+        "update_state_history": timed(sd.update_state_history, [(s,) for s in states]),
+        "write_vehicle_status": timed(sd.write_vehicle_status, list(zip(states, pct))),
+    }
+
+    # Whole per-frame engine step (landmark load → EAR → pose → blinks → status → score)
+    reset_state(engine)
+    results["engine.step"] = timed(engine.step, [(f, ts, FRAME_W, FRAME_H)
+                                                 for f, ts in zip(normalized_sequence(points), timestamps)])
+    sd.status_publisher.close()
+    return results
+
+
+def summarize(durations):
+    p50, p95, p99 = np.percentile(durations, (50, 95, 99))
+    return {
+        "ops_per_sec": round(float(len(durations) / (durations.sum() / 1e6)), 1),
+        "p50_us": round(float(p50), 2),
+        "p95_us": round(float(p95), 2),
+        "p99_us": round(float(p99), 2),
+        "max_us": round(float(durations.max()), 2),
+    }
+
+
+def best_of(points, fps, repeat):
+    """Run the suite `repeat` times and keep each benchmark's best (lowest p50) run"""
+    best = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for _ in range(repeat):
+            for name, durations in run_suite(points, fps, tmp_dir).items():
+                summary = summarize(durations)
+                if name not in best or summary["p50_us"] < best[name]["p50_us"]:
+                    best[name] = summary
+    return best
+
+
+# --- Baselines ---
+
+def baseline_path(name):
+    return BASELINE_DIR / f"{name}.json"
+
+
+def compare(current, baseline, tolerance):
+    """Print a diff table; returns the names whose p95 regressed by more than tolerance"""
+    regressions = []
+    print(f"\n{'benchmark':28s} {'p95 base':>10s} {'p95 now':>10s} {'change':>8s}")
+    for name, now in current.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:28s} {'-':>10s} {now['p95_us']:10.2f}      new")
+            continue
+        change = now["p95_us"] / base["p95_us"] - 1 if base["p95_us"] else 0.0
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"{name:28s} {base['p95_us']:10.2f} {now['p95_us']:10.2f} {change:+7.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection hot-path benchmark suite")
+    parser.add_argument('--frames', type=int, default=3000, help='Synthetic frames (default: %(default)s)')
+    parser.add_argument('--landmarks', help='Replay recorded landmarks (.slt trace, or .npz with points[, fps])')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=platform.node() or 'default',
+                        help='Baseline name, e.g. the hardware model (default: host name)')
+    parser.add_argument('--save', action='store_true', help='Store the results as the baseline')
+    parser.add_argument('--compare', action='store_true', help='Fail if p95 regressed past --tolerance')
+    parser.add_argument('--tolerance', type=float, default=0.20,
+                        help='Allowed p95 slowdown as a fraction (default: %(default)s)')
+    args = parser.parse_args()
+
+    if args.landmarks:
+        points, fps = load_sequence(args.landmarks)
+    else:
+        points, fps = synthetic_sequence(args.frames)
+
+    results = best_of(points, fps, args.repeat)
+    print(f"{len(points)} frames, best of {args.repeat} runs")
+    print(f"{'benchmark':28s} {'ops/s':>12s} {'p50 us':>9s} {'p95 us':>9s} {'p99 us':>9s} {'max us':>9s}")
+    for name, r in results.items():
+        print(f"{name:28s} {r['ops_per_sec']:12.0f} {r['p50_us']:9.2f} {r['p95_us']:9.2f} "
+              f"{r['p99_us']:9.2f} {r['max_us']:9.2f}")
+
+    path = baseline_path(args.baseline)
+    if args.compare:
+        if not path.is_file():
+            sys.exit(f"No baseline at {path}; record one with --save")
+        baseline = json.loads(path.read_text())["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+    if args.save:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path.write_text(json.dumps({
+            "frames": len(points),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "recorded": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, indent=2))
+        print(f"\nBaseline saved to {path}")
+
+
+if __name__ == '__main__':
+    main()
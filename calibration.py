@@ -0,0 +1,141 @@
+"""
+Per-driver EAR calibration
+During the first seconds of a session the detector feeds every EAR sample into a
+fixed-size histogram. That is a streaming quantile estimator with constant memory and
+O(1) work per sample. From the driver's open-eye EAR (the median) it derives a personal
+closed-eye threshold and drowsy band, which are stored per driver id so later sessions
+start already tuned.
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime
+
+from status_store import atomic_write_json
+
+log = logging.getLogger(__name__)
+
+# The stock DEFAULT_EAR_THRESHOLD / drowsy band (0.23 / 0.04) correspond to an open-eye EAR
+# of ~0.31 with these ratios
+THRESHOLD_RATIO = 0.75   # eyes count as closed below 75% of the open-eye EAR
+BAND_RATIO = 0.13        # drowsy band above the threshold, as a fraction of the open-eye EAR
+THRESHOLD_BOUNDS = (0.12, 0.35)
+OPEN_EAR_BOUNDS = (0.18, 0.50)  # outside this the face was probably mis-tracked
+
+
+class QuantileSketch:
+    """Histogram over [low, high) with fixed bins: O(1) add, quantiles to within one bin"""
+
+    def __init__(self, low=0.0, high=0.6, bins=600):
+        self.low = low
+        self.width = (high - low) / bins
+        self.counts = [0] * bins
+        self.count = 0
+
+    def add(self, value):
+        i = int((value - self.low) / self.width)
+        last = len(self.counts) - 1
+        self.counts[0 if i < 0 else last if i > last else i] += 1
+        self.count += 1
+
+    def quantile(self, q):
+        """Value below which a fraction q of the samples fall (bin centre); None if empty"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen > rank:
+                return self.low + (i + 0.5) * self.width
+        return self.low + (len(self.counts) - 0.5) * self.width
+
+    def clear(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+
+
+class EarCalibrator:
+    """Collects EAR for duration_sec of face time, then derives threshold and drowsy band"""
+
+    def __init__(self, duration_sec=30.0, min_samples=150, threshold_ratio=THRESHOLD_RATIO,
+                 band_ratio=BAND_RATIO):
+        self.duration_sec = duration_sec
+        self.min_samples = min_samples
+        self.threshold_ratio = threshold_ratio
+        self.band_ratio = band_ratio
+        self.sketch = QuantileSketch()
+        self.started = None
+        self.done = False
+
+    def add(self, ear, timestamp):
+        """One frame's EAR; returns True once the calibration period is over"""
+        if self.done:
+            return True
+        if self.started is None:
+            self.started = timestamp
+        self.sketch.add(ear)
+        self.done = timestamp - self.started >= self.duration_sec and self.sketch.count >= self.min_samples
+        return self.done
+
+    def remaining(self, timestamp):
+        if self.started is None:
+            return self.duration_sec
+        return max(0.0, self.duration_sec - (timestamp - self.started))
+
+    def result(self):
+        """Profile dict (threshold, drowsy_band, open/closed EAR, samples), or None if unusable"""
+        sketch = self.sketch
+        if sketch.count < self.min_samples:
+            log.warning(f"Calibration needs {self.min_samples} samples, got {sketch.count}")
+            return None
+        open_ear = sketch.quantile(0.5)
+        if not OPEN_EAR_BOUNDS[0] <= open_ear <= OPEN_EAR_BOUNDS[1]:
+            log.warning(f"Calibration rejected: open-eye EAR {open_ear:.3f} is implausible")
+            return None
+        low, high = THRESHOLD_BOUNDS
+        threshold = min(high, max(low, open_ear * self.threshold_ratio))
+        if sketch.quantile(0.25) < threshold:
+            # Eyes were shut a quarter of the time: already drowsy, or bad tracking
+            log.warning("Calibration rejected: eyes closed for too much of the calibration period")
+            return None
+        return {
+            "threshold": round(threshold, 3),
+            "drowsy_band": round(open_ear * self.band_ratio, 3),
+            "open_ear": round(open_ear, 3),
+            "closed_ear": round(sketch.quantile(0.02), 3),   # blink bottoms
+            "samples": sketch.count,
+            "calibrated_at": datetime.now().isoformat()
+        }
+
+
+class CalibrationStore:
+    """driver id → calibration profile, kept in one JSON object file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            self.profiles = data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            self.profiles = {}
+        except ValueError as e:
+            log.error(f"Error loading calibrations from {path}: {e}")
+            self.profiles = {}
+
+    def get(self, driver_id):
+        return self.profiles.get(str(driver_id))
+
+    def put(self, driver_id, profile):
+        """Store and write (atomically); once per calibration, not per frame"""
+        with self._lock:
+            self.profiles[str(driver_id)] = profile
+            try:
+                atomic_write_json(self.path, self.profiles, indent=2)
+            except OSError as e:
+                log.warning(f"Saving calibration for {driver_id} failed: {e}")
+                return False
+        return True
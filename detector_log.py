@@ -0,0 +1,130 @@
+"""
+Asynchronous logging for the detector
+Log calls from the frame loop only run a rate-limit check and a non-blocking put on a
+bounded queue. A QueueListener thread formats the records and writes them to the console
+and a rotating file, so terminal or disk stalls never hold up a frame. If the queue is
+full, records are dropped and counted instead of blocking.
+
+Repeated messages are limited per message template: at most `burst` records in a row,
+then one per `interval` seconds. The next record that gets through reports how many
+were skipped. Hot-path calls should use %-style arguments,
+log.info("Status changed to: %s", status), so every status shares one template.
+"""
+
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+LOG_DIR = "logs"
+LOG_FILE = os.path.join(LOG_DIR, "detector.log")
+LOG_MAX_BYTES = 2 * 1024 * 1024
+LOG_BACKUPS = 5
+QUEUE_SIZE = 10000
+
+FILE_FORMAT = "%(asctime)s %(levelname)-7s %(threadName)s %(name)s: %(message)s"
+CONSOLE_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per (logger, message template); suppressed counts ride on the next record"""
+
+    def __init__(self, burst=5, interval=1.0, overrides=None):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        # template → (burst, interval) for messages that need their own pace
+        self.overrides = overrides or {}
+        self.suppressed = 0
+        self._buckets = {}   # key → [tokens, last refill, suppressed since last pass]
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        burst, interval = self.overrides.get(record.msg, (self.burst, self.interval))
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now, 0]
+        elif interval > 0:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) / interval)
+            bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            self.suppressed += 1
+            return False
+        bucket[0] -= 1
+        if bucket[2]:
+            record.msg = f"{record.msg} [{bucket[2]} similar suppressed]"
+            bucket[2] = 0
+        return True
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener as-is; formatting happens on the writer thread"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The listener lives in this process, so the record doesn't need to be pickled or
+        # pre-formatted. Log arguments should be values (str, numbers), not live objects
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+_handler = None
+
+
+def setup_logging(path=LOG_FILE, level=logging.INFO, console=True, max_bytes=LOG_MAX_BYTES,
+                  backups=LOG_BACKUPS, rate_limit=None, queue_size=QUEUE_SIZE):
+    """
+    Route the root logger through the background writer; returns the queue handler
+    (it has .dropped, and .filters[0].suppressed if rate limiting is on). Safe to call twice.
+    """
+    global _listener, _handler
+    if _handler is not None:
+        return _handler
+
+    handlers = []
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT, datefmt="%H:%M:%S"))
+        handlers.append(console_handler)
+
+    log_queue = queue.Queue(queue_size)
+    _handler = AsyncQueueHandler(log_queue)
+    _handler.addFilter(rate_limit if rate_limit is not None else RateLimitFilter())
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level)
+    return _handler
+
+
+def shutdown_logging():
+    """Flush what is queued and stop the writer thread (call once, at exit)"""
+    global _listener, _handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_handler)
+    _listener.stop()   # writes the remaining records before returning
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = _handler = None
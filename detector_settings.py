@@ -0,0 +1,46 @@
+"""
+Detection settings shared by the live detector and the offline tools
+Importing this module has no side effects: no Face Mesh graph, no files, no threads.
+Batch workers, trace replay and benchmarks build their engines and meshes here instead of
+importing sleep_detector, which sets up the whole live detector.
+"""
+
+from drowsiness_engine import DrowsinessEngine
+
+DEFAULT_EAR_THRESHOLD = 0.23  # Keep default threshold constant
+DEFAULT_DROWSY_BAND = 0.04    # EAR band above the threshold that counts as drowsy
+# State machine timing in milliseconds (frame-rate independent; see drowsiness_engine)
+STATE_HOLD_MS = 500   # How long an EAR band must persist before its status is reported
+MICROSLEEP_MS = 1000  # Eye closure at least this long is a microsleep
+HEAD_POSE_EVERY_N = 1  # Solve head pose every N frames (extrapolated in between)
+
+# Variable for sleepiness percentage
+MAX_HISTORY = 100  # Number of frames to consider for percentage
+SLEEP_WINDOW_SEC = None  # Set (e.g. 5.0) to use a time window instead of MAX_HISTORY frames
+# Longer concurrent trend windows (label → seconds)
+TREND_WINDOWS_SEC = {"5s": 5, "60s": 60, "10m": 600}
+
+FACE_MESH_CONFIDENCE = 0.7
+
+
+def create_face_mesh():
+    """New Face Mesh with the detector's settings (batch workers each need their own)"""
+    import mediapipe as mp
+    return mp.solutions.face_mesh.FaceMesh(
+        min_detection_confidence=FACE_MESH_CONFIDENCE,
+        min_tracking_confidence=FACE_MESH_CONFIDENCE
+    )
+
+
+def create_engine(threshold=DEFAULT_EAR_THRESHOLD, drowsy_band=DEFAULT_DROWSY_BAND):
+    """New detection engine with the detector's settings (batch workers and replays each need their own)"""
+    return DrowsinessEngine(
+        threshold=threshold,
+        drowsy_band=drowsy_band,
+        state_hold_ms=STATE_HOLD_MS,
+        microsleep_ms=MICROSLEEP_MS,
+        max_history=MAX_HISTORY,
+        sleep_window_sec=SLEEP_WINDOW_SEC,
+        trend_windows_sec=TREND_WINDOWS_SEC,
+        head_pose_every_n=HEAD_POSE_EVERY_N
+    )
@@ -0,0 +1,199 @@
+"""
+Drowsiness state machine for one driver
+EAR, head pose, blink / microsleep counting, status debouncing and the rolling sleepiness
+score, with all state on one object instead of module globals. Buffers are allocated once,
+so step() does no per-frame array allocation; many engines can run side by side
+(live loop, batch workers, trace replay, multi-driver services).
+Debouncing and microsleeps are measured in milliseconds between frame timestamps, not in
+frames, so alert latency doesn't depend on the frame rate. Timestamps are seconds on a
+monotonic clock (the live loop passes each frame's capture time) or video / trace time.
+"""
+
+import time
+
+import numpy as np
+
+from head_pose import HeadPoseEstimator
+from landmarks import EYES_IDX, POSE_IDX, LandmarkArray, ear_work_buffers, eye_aspect_ratio_batch
+from rolling_window import FrameWindow, TimeWindow, percentage
+
+STATUS_ACTIVE = "Active :)"
+STATUS_DROWSY = "Drowsy !"
+STATUS_SLEEPING = "SLEEPING !!!"
+
+# Score per status for the sleepiness percentage (max 2 → 100%)
+STATUS_SCORES = {STATUS_SLEEPING: 2, STATUS_DROWSY: 1}
+
+
+class DrowsinessEngine:
+    """
+    step(landmarks, timestamp, w, h) once per frame with a face, no_face() otherwise;
+    results are read from attributes (ear, status, sleep_percentage, ...).
+    """
+
+    __slots__ = (
+        # settings
+        "threshold", "drowsy_band", "state_hold_ms", "microsleep_ms", "blink_gap_sec",
+        # per-frame results
+        "ear", "left_ear", "right_ear", "pitch", "yaw", "roll",
+        "status", "status_changed", "alert", "microsleep_ms_ended",
+        # debounce: EAR band of the current run of frames and when that run started
+        "band", "band_since",
+        # blink / microsleep
+        "closed_since", "blink_duration", "total_blinks", "last_blink_time", "blink_rate",
+        "microsleep_count", "session_start",
+        # sleepiness score
+        "sleep_percentage", "sleep_window", "trend_windows", "trend_percentages",
+        # reusable helpers and buffers
+        "landmarks", "head_pose", "_eyes", "_ears", "_ear_work", "_pose_points",
+    )
+
+    def __init__(self, threshold=0.23, state_hold_ms=500, microsleep_ms=1000, drowsy_band=0.04,
+                 max_history=100, sleep_window_sec=None, trend_windows_sec=None,
+                 head_pose_every_n=1, blink_gap_sec=0.5):
+        self.threshold = threshold
+        self.drowsy_band = drowsy_band          # EAR band above the threshold that counts as drowsy
+        self.state_hold_ms = state_hold_ms      # how long a state must persist before it is reported
+        self.microsleep_ms = microsleep_ms      # eye closure at least this long is a microsleep
+        self.blink_gap_sec = blink_gap_sec      # closures closer than this continue the last blink
+        self.landmarks = LandmarkArray()
+        self.head_pose = HeadPoseEstimator(every_n=head_pose_every_n)
+        # Ring buffers with running sums: O(1) per frame whatever the window length
+        self.sleep_window = TimeWindow(sleep_window_sec) if sleep_window_sec else FrameWindow(max_history)
+        self.trend_windows = {label: TimeWindow(sec) for label, sec in (trend_windows_sec or {}).items()}
+        self.trend_percentages = {label: 0 for label in self.trend_windows}
+        self._eyes = np.zeros((2, 6, 2))
+        self._ears = np.zeros(2)
+        self._ear_work = ear_work_buffers((2,))
+        self._pose_points = np.zeros((6, 2))
+        self.reset()
+
+    def reset(self, start_time=None):
+        """Fresh session (new driver, new video, new replay run); start_time defaults to perf_counter()"""
+        self.no_face()
+        self.ear = self.left_ear = self.right_ear = 0.0
+        self.pitch = self.yaw = self.roll = 0.0
+        self.total_blinks = 0
+        self.last_blink_time = 0
+        self.blink_rate = 0
+        self.microsleep_count = 0
+        self.sleep_percentage = 0
+        self.session_start = time.perf_counter() if start_time is None else start_time
+        self.sleep_window.clear()
+        for label, window in self.trend_windows.items():
+            window.clear()
+            self.trend_percentages[label] = 0
+
+    def no_face(self):
+        """No face this frame: debounce and eye closure restart and the pose guess is dropped"""
+        self.band = None
+        self.band_since = 0.0
+        self.status = ""
+        self.status_changed = False
+        self.alert = False
+        self.microsleep_ms_ended = 0.0
+        self.closed_since = None
+        self.blink_duration = 0.0
+        self.head_pose.reset()  # Stale pose is a bad solvePnP guess
+
+    # --- per-frame pieces ---
+
+    def _eye_aspect_ratios(self):
+        """Both EARs from the filled landmark points (shared kernel, preallocated buffers)"""
+        np.take(self.landmarks.points, EYES_IDX, axis=0, out=self._eyes)
+        ears = eye_aspect_ratio_batch(self._eyes, out=self._ears, work=self._ear_work)
+        self.left_ear = ears[0]
+        self.right_ear = ears[1]
+        self.ear = (self.left_ear + self.right_ear) / 2.0
+
+    def _update_blinks(self, timestamp):
+        self.microsleep_ms_ended = 0.0
+        if self.ear < self.threshold:
+            if self.closed_since is None:  # Start of blink
+                self.closed_since = timestamp
+                if timestamp - self.last_blink_time > self.blink_gap_sec:  # Valid blink (not continuation)
+                    self.total_blinks += 1
+                    self.last_blink_time = timestamp
+            self.blink_duration = (timestamp - self.closed_since) * 1000
+        else:
+            if self.closed_since is not None:  # End of blink: eyes were shut until this frame
+                closed_ms = (timestamp - self.closed_since) * 1000
+                if closed_ms >= self.microsleep_ms:
+                    self.microsleep_count += 1
+                    self.microsleep_ms_ended = closed_ms
+                self.closed_since = None
+            self.blink_duration = 0.0
+
+        session_duration = timestamp - self.session_start
+        self.blink_rate = self.total_blinks / (session_duration / 60) if session_duration > 0 else 0
+
+    def _update_status(self, timestamp):
+        old_status = self.status
+        ear, threshold = self.ear, self.threshold
+        if ear < threshold:
+            band = STATUS_SLEEPING
+        elif ear < threshold + self.drowsy_band:
+            band = STATUS_DROWSY
+        else:
+            band = STATUS_ACTIVE
+        if band != self.band:
+            self.band = band
+            self.band_since = timestamp
+        # Report the band once it has held for state_hold_ms
+        held = (timestamp - self.band_since) * 1000 >= self.state_hold_ms
+        if held:
+            self.status = band
+        self.status_changed = bool(self.status) and old_status != self.status
+        self.alert = held and band == STATUS_SLEEPING
+
+    def update_sleep_percentage(self, state, timestamp):
+        """Push the state's score into the rolling windows (constant time per call)"""
+        score = STATUS_SCORES.get(state, 0)
+        self.sleep_window.push(score, timestamp)
+        for label, window in self.trend_windows.items():
+            window.push(score, timestamp)
+            self.trend_percentages[label] = percentage(window)
+        self.sleep_percentage = percentage(self.sleep_window)
+
+    def step(self, face_landmarks, timestamp, width, height, roi=None):
+        """
+        One frame with a face. face_landmarks is a Face Mesh result or an (N, 3) array of
+        normalized points; roi is the crop Face Mesh ran on, if any. Returns self.
+        """
+        self.landmarks.fill(face_landmarks, width, height, roi)
+        self._eye_aspect_ratios()
+
+        np.take(self.landmarks.points, POSE_IDX, axis=0, out=self._pose_points)
+        angles = self.head_pose.update(self._pose_points, width, height)   # (pitch, yaw, roll)
+        self.pitch = angles[0]
+        self.yaw = angles[1]
+        self.roll = angles[2]
+
+        self._update_blinks(timestamp)
+        self._update_status(timestamp)
+        self.update_sleep_percentage(self.status, timestamp)
+        return self
+
+    @property
+    def head_pose_angles(self):
+        return {'pitch': self.pitch, 'yaw': self.yaw, 'roll': self.roll}
+
+    def metrics(self):
+        """Current results as a dict (allocates; for batch columns and logging, not the hot loop)"""
+        return {
+            "ear": self.ear,
+            "left_ear": self.left_ear,
+            "right_ear": self.right_ear,
+            "pitch": self.pitch,
+            "yaw": self.yaw,
+            "roll": self.roll,
+            "status": self.status,
+            "status_changed": self.status_changed,
+            "sleep_percentage": self.sleep_percentage,
+            "blink_duration": self.blink_duration,
+            "total_blinks": self.total_blinks,
+            "blink_rate": self.blink_rate,
+            "microsleep_ms": self.microsleep_ms_ended,
+            "microsleep_count": self.microsleep_count,
+            "alert": self.alert
+        }
@@ -0,0 +1,144 @@
+"""
+Threaded frame pipeline for the detector
+capture thread → inference worker → render/UI (main) thread
+Stages are linked by bounded drop-oldest queues so inference always sees the freshest frame.
+"""
+
+import threading
+import time
+
+import cv2
+
+from latest_queue import LatestQueue
+
+
+class CaptureWorker(threading.Thread):
+    """Reads frames from the camera as fast as it delivers them"""
+
+    def __init__(self, video_capture, out_queue, stop_event, telemetry=None):
+        super().__init__(name="capture", daemon=True)
+        self.video_capture = video_capture
+        self.timer = telemetry["capture"] if telemetry is not None else None
+        self.out_queue = out_queue
+        self.stop_event = stop_event
+        self.error = None
+        self.frames = 0
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                started = time.perf_counter()
+                ret, frame = self.video_capture.read()
+                if self.timer is not None:
+                    self.timer.since(started)
+                if not ret:
+                    self.error = "Failed to read frame from webcam"
+                    break
+                self.frames += 1
+                # Timestamp as close to the glass as we can get
+                self.out_queue.put({
+                    "frame": frame,
+                    "index": self.frames,
+                    "captured_at": time.perf_counter()
+                })
+        except Exception as e:
+            self.error = f"Capture failed: {e!r}"
+        finally:
+            self.out_queue.close()
+
+
+class InferenceWorker(threading.Thread):
+    """Flips, converts and runs Face Mesh on the newest captured frame"""
+
+    def __init__(self, face_mesh, in_queue, out_queue, stop_event, scheduler=None, telemetry=None):
+        super().__init__(name="inference", daemon=True)
+        self.face_mesh = face_mesh
+        self.timer = telemetry["inference"] if telemetry is not None else None
+        self.scheduler = scheduler  # adaptive_inference.AdaptiveScheduler or None (every frame, full size)
+        self._last = (None, None)   # (results, roi) reused on skipped frames
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.stop_event = stop_event
+        self.error = None
+        self.frames = 0
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                packet = self.in_queue.get(timeout=0.5)
+                if packet is None:
+                    if self.in_queue.closed:
+                        break
+                    continue
+
+                started = time.perf_counter()
+                frame = cv2.flip(packet["frame"], 1)
+                packet["frame"] = frame
+                scheduler = self.scheduler
+                if scheduler is None:
+                    self._last = (self.face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)), None)
+                    packet["fresh"] = True
+                elif scheduler.should_infer() or self._last[0] is None:
+                    image, roi = scheduler.prepare(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                    self._last = (self.face_mesh.process(image), roi)
+                    packet["fresh"] = True
+                else:
+                    packet["fresh"] = False
+                packet["results"], packet["roi"] = self._last
+                if self.timer is not None and packet["fresh"]:
+                    self.timer.since(started)
+                packet["inferred_at"] = time.perf_counter()
+                self.frames += 1
+                self.out_queue.put(packet)
+        except Exception as e:
+            self.error = f"Inference failed: {e!r}"
+        finally:
+            self.out_queue.close()
+
+
+class FramePipeline:
+    """Owns the capture and inference threads; the caller is the render/UI stage"""
+
+    def __init__(self, video_capture, face_mesh, queue_size=1, scheduler=None, telemetry=None):
+        self._stop = threading.Event()
+        self.scheduler = scheduler
+        self.capture_queue = LatestQueue(queue_size)
+        self.result_queue = LatestQueue(queue_size)
+        # telemetry: telemetry.Telemetry or None; capture/inference stage times are recorded here
+        self.capture = CaptureWorker(video_capture, self.capture_queue, self._stop, telemetry)
+        self.inference = InferenceWorker(face_mesh, self.capture_queue, self.result_queue, self._stop,
+                                         scheduler, telemetry)
+
+    @property
+    def error(self):
+        """Why a worker stopped (failed read or exception), or None while both are running"""
+        return self.inference.error or self.capture.error
+
+    @property
+    def stopped(self):
+        """True once the inference worker has exited; read() will only return None from then on"""
+        return self.result_queue.closed
+
+    @property
+    def dropped(self):
+        """Frames discarded because a downstream stage was still busy"""
+        return self.capture_queue.dropped + self.result_queue.dropped
+
+    def start(self):
+        self.capture.start()
+        self.inference.start()
+        return self
+
+    def read(self, timeout=1.0):
+        """
+        Next processed packet: {'frame', 'results', 'roi', 'fresh', 'index', 'captured_at', 'inferred_at'}
+        roi is the crop Face Mesh ran on (None = full frame); fresh is False when results were reused.
+        """
+        return self.result_queue.get(timeout)
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        self.capture_queue.close()
+        self.result_queue.close()
+        self.capture.join(timeout)
+        self.inference.join(timeout)
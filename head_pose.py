@@ -0,0 +1,133 @@
+"""
+Head pose (pitch, yaw, roll) estimation with cached camera intrinsics
+solvePnP is warm-started from the previous frame and can run only every N frames.
+The estimator writes (pitch, yaw, roll) into preallocated arrays, so a frame allocates no
+dict or array of its own.
+"""
+
+import cv2
+import numpy as np
+
+# 3D model points (generic face model), same order as landmarks.POSE_IDX
+MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0),             # Nose tip
+    (0.0, -330.0, -65.0),        # Chin
+    (-225.0, 170.0, -135.0),     # Left eye left corner
+    (225.0, 170.0, -135.0),      # Right eye right corner
+    (-150.0, -150.0, -125.0),    # Left Mouth corner
+    (150.0, -150.0, -125.0)      # Right mouth corner
+], dtype="double")
+
+# Assuming no lens distortion
+DIST_COEFFS = np.zeros((4, 1))
+
+ZERO_POSE = {'pitch': 0, 'yaw': 0, 'roll': 0}
+
+
+def camera_matrix_for(frame_width, frame_height):
+    """Pinhole intrinsics approximated from the frame size"""
+    focal_length = frame_width
+    center = (frame_width / 2, frame_height / 2)
+    return np.array(
+        [[focal_length, 0, center[0]],
+         [0, focal_length, center[1]],
+         [0, 0, 1]], dtype="double"
+    )
+
+
+def rotation_to_angles(rotation_vector, out=None, rotation_matrix=None):
+    """
+    Rotation vector → {'pitch', 'yaw', 'roll'} in degrees.
+    With out (a length-3 array) the angles are written there instead, in that order, and
+    out is returned; rotation_matrix is an optional (3, 3) buffer for the Rodrigues step.
+    """
+    rotation_matrix, _ = cv2.Rodrigues(rotation_vector, rotation_matrix)
+    angles = cv2.RQDecomp3x3(rotation_matrix)[0]
+    if out is None:
+        return {'pitch': angles[0], 'yaw': angles[1], 'roll': angles[2]}
+    out[0], out[1], out[2] = angles
+    return out
+
+
+class HeadPoseEstimator:
+    """
+    Stateful head pose estimator for one tracked face.
+    every_n > 1 solves PnP on every Nth frame and linearly extrapolates angles in between.
+    update() returns self.angles, a (pitch, yaw, roll) array that is overwritten every frame.
+    """
+
+    def __init__(self, every_n=1):
+        self.every_n = max(1, int(every_n))
+        self._size = None
+        self._camera_matrix = None
+        self._image_points = np.zeros((6, 2), dtype="double")
+        self._rotation = np.zeros((3, 3))
+        self.angles = np.zeros(3)
+        self._last = np.zeros(3)
+        self._rate = np.zeros(3)    # degrees per frame between the last two solves
+        self.reset()
+
+    def reset(self):
+        """Forget the previous pose (call when the face is lost)"""
+        self._rvec = None
+        self._tvec = None
+        self._frame = 0
+        self.angles.fill(0.0)
+        self._last.fill(0.0)
+        self._rate.fill(0.0)
+        self._since_solve = 0
+
+    def _intrinsics(self, frame_width, frame_height):
+        if self._size != (frame_width, frame_height):
+            self._size = (frame_width, frame_height)
+            self._camera_matrix = camera_matrix_for(frame_width, frame_height)
+            self._rvec = self._tvec = None  # a guess from another resolution is useless
+        return self._camera_matrix
+
+    def _solve(self, pose_points, frame_width, frame_height):
+        camera_matrix = self._intrinsics(frame_width, frame_height)
+        self._image_points[:] = pose_points
+
+        if self._rvec is not None:
+            success, rvec, tvec = cv2.solvePnP(
+                MODEL_POINTS, self._image_points, camera_matrix, DIST_COEFFS,
+                self._rvec, self._tvec, useExtrinsicGuess=True, flags=cv2.SOLVEPNP_ITERATIVE)
+        else:
+            success, rvec, tvec = cv2.solvePnP(
+                MODEL_POINTS, self._image_points, camera_matrix, DIST_COEFFS,
+                flags=cv2.SOLVEPNP_ITERATIVE)
+
+        if not success:
+            self._rvec = self._tvec = None
+            return False
+        self._rvec, self._tvec = rvec, tvec
+        rotation_to_angles(rvec, self.angles, self._rotation)
+        return True
+
+    def update(self, pose_points, frame_width, frame_height):
+        """
+        Pose for the current frame from (6, 2) pixel points in landmarks.POSE_IDX order;
+        returns self.angles (pitch, yaw, roll), zeros if solvePnP failed
+        """
+        self._frame += 1
+        angles = self.angles
+        if self._rvec is not None and (self._frame - 1) % self.every_n:
+            # Skipped frame: extrapolate from the last two solves
+            self._since_solve += 1
+            np.multiply(self._rate, self._since_solve, out=angles)
+            angles += self._last
+            return angles
+
+        warm = self._rvec is not None
+        if not self._solve(pose_points, frame_width, frame_height):
+            angles.fill(0.0)
+            return angles
+
+        if warm:
+            np.subtract(angles, self._last, out=self._rate)
+            self._rate /= self._since_solve + 1
+        else:
+            self._rate.fill(0.0)
+        self._last[:] = angles
+        self._since_solve = 0
+        return angles
@@ -0,0 +1,106 @@
+"""
+Binary landmark traces for deterministic replay
+A 64-byte header followed by fixed-size frame records, so a trace can be appended
+to while recording and memory-mapped (np.memmap) for replay without parsing:
+
+  header  magic b"SLPXTRC1", version u16, point dtype u8 (2 = float16, 4 = float32),
+          flags u8, points per face u16, frame width u16, frame height u16, fps f32
+  record  timestamp f64 (s) | face u8 (0 = no face) | pad | points (N, 3) normalized x, y, z
+
+The frame count is taken from the file size, so a trace cut short by a crash stays readable.
+"""
+
+import struct
+
+import numpy as np
+
+from landmarks import NUM_LANDMARKS
+
+TRACE_EXTENSION = ".slt"
+MAGIC = b"SLPXTRC1"
+VERSION = 1
+HEADER = struct.Struct("<8sHBBHHHf")
+HEADER_SIZE = 64
+POINT_DTYPES = {2: np.float16, 4: np.float32}
+
+
+def record_dtype(num_points=NUM_LANDMARKS, point_dtype=np.float32):
+    return np.dtype([
+        ("timestamp", "<f8"),
+        ("face", "u1"),
+        ("pad", "u1", 7),
+        ("points", np.dtype(point_dtype).newbyteorder("<"), (num_points, 3)),
+    ])
+
+
+class TraceWriter:
+    """Appends one record per processed frame; float16 halves the size (~2.8 KB/frame)"""
+
+    def __init__(self, path, width, height, fps=0.0, num_points=NUM_LANDMARKS, point_dtype=np.float32):
+        point_dtype = np.dtype(point_dtype)
+        if point_dtype.itemsize not in POINT_DTYPES:
+            raise ValueError("point_dtype must be float16 or float32")
+        self.path = path
+        self.frames = 0
+        self._record = np.zeros(1, dtype=record_dtype(num_points, point_dtype))
+        self._file = open(path, "wb")
+        header = HEADER.pack(MAGIC, VERSION, point_dtype.itemsize, 0, num_points, width, height, fps)
+        self._file.write(header.ljust(HEADER_SIZE, b"\x00"))
+
+    def write(self, timestamp, normalized=None):
+        """normalized: (N, 3) full-frame landmarks, or None when no face was found"""
+        rec = self._record
+        rec["timestamp"][0] = timestamp
+        if normalized is None:
+            rec["face"][0] = 0
+            rec["points"][0] = 0
+        else:
+            rec["face"][0] = 1
+            rec["points"][0] = normalized
+        self._file.write(self._record.tobytes())
+        self.frames += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class LandmarkTrace:
+    """Memory-mapped trace: timestamps, face flags and normalized points as array views"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            raw = f.read(HEADER_SIZE)
+        if len(raw) < HEADER.size:
+            raise ValueError(f"{path} is not a landmark trace (file too short)")
+        magic, version, itemsize, _, num_points, self.width, self.height, self.fps = \
+            HEADER.unpack_from(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a landmark trace")
+        if version != VERSION or itemsize not in POINT_DTYPES:
+            raise ValueError(f"{path}: unsupported trace version {version} / point size {itemsize}")
+
+        self.path = path
+        self.dtype = record_dtype(num_points, POINT_DTYPES[itemsize])
+        size = np.memmap(path, dtype=np.uint8, mode="r").shape[0]
+        count = (size - HEADER_SIZE) // self.dtype.itemsize   # drop a partial trailing record
+        if count:
+            self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+        self.timestamps = self.records["timestamp"]
+        self.face = self.records["face"].astype(bool)
+        self.points = self.records["points"]
+
+    def __len__(self):
+        return len(self.records)
+
+    def duration(self):
+        return float(self.timestamps[-1] - self.timestamps[0]) if len(self) > 1 else 0.0
+
+    def pixel_points(self):
+        """(frames, N, 2) float64 pixel coordinates (materialized)"""
+        return self.points[:, :, :2].astype(np.float64) * (self.width, self.height)
@@ -0,0 +1,166 @@
+"""
+Face Mesh landmark → NumPy conversion
+One preallocated (N, 3) array per face; EAR, bounding box and head pose index into it.
+"""
+
+import numpy as np
+
+NUM_LANDMARKS = 468
+
+# Landmark indices used by the detector (fancy-indexing into the point array)
+LEFT_EYE_IDX = np.array([33, 160, 158, 133, 153, 144])
+RIGHT_EYE_IDX = np.array([362, 385, 387, 263, 373, 380])
+EYES_IDX = np.stack([LEFT_EYE_IDX, RIGHT_EYE_IDX])   # (2, 6)
+POSE_IDX = np.array([1, 175, 33, 263, 61, 291])      # nose, chin, eye corners, mouth corners
+
+# Wire layout of one serialized NormalizedLandmark inside a NormalizedLandmarkList:
+# 0x0a <len=15> | 0x0d x:f32 | 0x15 y:f32 | 0x1d z:f32
+_WIRE_DTYPE = np.dtype([
+    ("tag", "u1"), ("size", "u1"),
+    ("x_tag", "u1"), ("x", "<f4"),
+    ("y_tag", "u1"), ("y", "<f4"),
+    ("z_tag", "u1"), ("z", "<f4"),
+])
+_WIRE_TAGS = (0x0a, 15, 0x0d, 0x15, 0x1d)
+# x, y and z sit 5 bytes apart, so one strided (count, 3) float view covers all three
+_WIRE_XYZ_OFFSET = _WIRE_DTYPE.fields["x"][1]
+_WIRE_XYZ_STRIDES = (_WIRE_DTYPE.itemsize, _WIRE_DTYPE.fields["y"][1] - _WIRE_XYZ_OFFSET)
+
+
+def _wire_layout_ok(buf, count):
+    """Check every field tag of a serialized landmark list (done once, not per frame)"""
+    if len(buf) != count * _WIRE_DTYPE.itemsize:
+        return False
+    rec = np.frombuffer(buf, dtype=_WIRE_DTYPE)
+    return all(np.all(rec[field] == expected)
+               for field, expected in zip(("tag", "size", "x_tag", "y_tag", "z_tag"), _WIRE_TAGS))
+
+
+def _wire_points(buf, count):
+    """(count, 3) float32 view of x/y/z inside the protobuf bytes (no copy)"""
+    return np.ndarray((count, 3), dtype="<f4", buffer=buf, offset=_WIRE_XYZ_OFFSET,
+                      strides=_WIRE_XYZ_STRIDES)
+
+
+class LandmarkArray:
+    """Reusable landmark buffers, filled once per face per frame"""
+
+    def __init__(self, num_points=NUM_LANDMARKS):
+        self.normalized = np.zeros((num_points, 3), dtype=np.float32)  # raw x, y, z in [0, 1]
+        self.points = np.zeros((num_points, 2), dtype=np.float64)      # pixel x, y
+        self._scale = np.ones(2, dtype=np.float64)
+        self._wire_ok = None   # protobuf layout checked on the first Face Mesh result
+
+    def fill(self, face_landmarks, w, h, roi=None):
+        """
+        Convert one Face Mesh result into pixel points; returns self.points.
+        roi=(x0, y0, roi_w, roi_h) when Face Mesh ran on a crop: landmarks are mapped back
+        to full-frame coordinates (self.normalized too).
+        An (N, 3) array of normalized points (e.g. from a landmark trace) is accepted as well.
+        """
+        if isinstance(face_landmarks, np.ndarray):
+            return self.load(face_landmarks, w, h)
+        lms = face_landmarks.landmark
+        count = len(lms)
+        if count != len(self.normalized):
+            self.normalized = np.zeros((count, 3), dtype=np.float32)
+            self.points = np.zeros((count, 2), dtype=np.float64)
+            self._wire_ok = None
+
+        # Decode x/y/z straight from the protobuf bytes. The tags are validated once; after
+        # that the length check catches a landmark list with visibility/presence set
+        buf = None
+        if self._wire_ok is not False:
+            serialize = getattr(face_landmarks, "SerializeToString", None)
+            if serialize is None:
+                self._wire_ok = False
+            else:
+                buf = serialize()
+                if self._wire_ok is None:
+                    self._wire_ok = _wire_layout_ok(buf, count)
+        if self._wire_ok and len(buf) == count * _WIRE_DTYPE.itemsize:
+            self.normalized[:] = _wire_points(buf, count)
+        else:
+            # Fallback: flat iterator, still no per-landmark tuple/array allocation
+            self.normalized.reshape(-1)[:] = np.fromiter(
+                (c for lm in lms for c in (lm.x, lm.y, lm.z)), dtype=np.float32, count=3 * count)
+
+        if roi is None:
+            self._scale[0] = w
+            self._scale[1] = h
+            np.multiply(self.normalized[:, :2], self._scale, out=self.points)
+            return self.points
+
+        x0, y0, roi_w, roi_h = roi
+        self._scale[0] = roi_w
+        self._scale[1] = roi_h
+        np.multiply(self.normalized[:, :2], self._scale, out=self.points)
+        self.points[:, 0] += x0
+        self.points[:, 1] += y0
+        self.normalized[:, 0] = self.points[:, 0] / w
+        self.normalized[:, 1] = self.points[:, 1] / h
+        return self.points
+
+    def load(self, normalized, w, h):
+        """Fill from an (N, 3) array of full-frame normalized points; returns self.points"""
+        if normalized.shape != self.normalized.shape:
+            self.normalized = np.zeros(normalized.shape, dtype=np.float32)
+            self.points = np.zeros((len(normalized), 2), dtype=np.float64)
+        self.normalized[:] = normalized
+        self._scale[0] = w
+        self._scale[1] = h
+        np.multiply(self.normalized[:, :2], self._scale, out=self.points)
+        return self.points
+
+    def bounding_box(self, w, h, padding=20):
+        """Padded (x_min, y_min, x_max, y_max) clipped to the frame"""
+        mins = self.points.min(axis=0)
+        maxs = self.points.max(axis=0)
+        return (max(0, int(mins[0]) - padding),
+                max(0, int(mins[1]) - padding),
+                min(w, int(maxs[0]) + padding),
+                min(h, int(maxs[1]) + padding))
+
+    def eyes(self):
+        """(2, 6, 2) array: left and right eye contour points"""
+        return self.points[EYES_IDX]
+
+    def pose_points(self):
+        """(6, 2) image points for solvePnP"""
+        return self.points[POSE_IDX]
+
+
+# Vertical pairs (p2-p6, p3-p5) followed by the horizontal pair (p1-p4)
+_EAR_FROM = np.array([1, 2, 0])
+_EAR_TO = np.array([5, 4, 3])
+
+
+def ear_work_buffers(batch_shape=(2,)):
+    """Scratch buffers for eye_aspect_ratio_batch(..., work=...) on eyes shaped batch_shape + (6, 2)"""
+    batch_shape = tuple(batch_shape)
+    return np.zeros((2,) + batch_shape + (3, 2)), np.zeros(batch_shape + (3,))
+
+
+def eye_aspect_ratio_batch(eyes, out=None, work=None):
+    """
+    Vectorized EAR for any array shaped (..., 6, 2), e.g. (faces, eyes, 6, 2) → (faces, eyes).
+    Same formula as sleep_detector.eye_aspect_ratio, in a single NumPy pass.
+    out (shaped like the result) and work (from ear_work_buffers) make the call
+    allocation-free; the detection engine passes both every frame.
+    """
+    eyes = np.asarray(eyes, dtype=np.float64)
+    if work is None:
+        work = ear_work_buffers(eyes.shape[:-2])
+    if out is None:
+        out = np.empty(eyes.shape[:-2])
+    pairs, dist = work
+    d = pairs[0]
+    np.take(eyes, _EAR_FROM, axis=-2, out=d)
+    np.take(eyes, _EAR_TO, axis=-2, out=pairs[1])
+    np.subtract(d, pairs[1], out=d)                           # (..., 3, 2)
+    np.einsum("...ij,...ij->...i", d, d, out=dist)
+    np.sqrt(dist, out=dist)                                   # (..., 3)
+    np.add(dist[..., 0], dist[..., 1], out=out)
+    np.divide(out, dist[..., 2], out=out)
+    out *= 0.5
+    return out if out.ndim else out[()]
@@ -0,0 +1,48 @@
+"""
+Drop-oldest queue shared by the frame pipeline, status ingest and alert dispatcher
+Standard library only, so modules that use it (status_store, the Arduino bridge) don't
+pull in OpenCV.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class LatestQueue:
+    """Bounded queue that drops the oldest item instead of blocking the producer"""
+
+    def __init__(self, maxsize=1):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1  # deque(maxlen) evicts the oldest entry for us
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest queued item, or None on timeout / when closed and empty"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            while not self._items and not self._closed:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
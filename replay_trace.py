@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Deterministic replay of recorded landmark traces (see landmark_trace.py)
+Feeds the recorded 468-point landmarks through the detector's state machine as fast as the
+CPU allows — no camera, no MediaPipe — so thresholds and frame counts can be re-tuned
+against real field data in seconds. Several values per parameter run as a grid.
+Timing is in milliseconds of trace time, so results carry over to any live frame rate.
+
+Record:  python sleep_detector.py --record incident.slt
+Replay:  python replay_trace.py incident.slt --threshold 0.18 0.20 0.22 --state-hold-ms 300 500
+"""
+
+import argparse
+import itertools
+import time
+from pathlib import Path
+
+import numpy as np
+
+import detector_settings as settings
+from batch_analysis import STATUS_CODES, record_frame, save_metrics, to_columns, COLUMNS
+from drowsiness_engine import STATUS_DROWSY, STATUS_SLEEPING
+from landmark_trace import LandmarkTrace
+
+SLEEPING = STATUS_CODES[STATUS_SLEEPING]
+DROWSY = STATUS_CODES[STATUS_DROWSY]
+
+
+def replay(trace, threshold, state_hold_ms, microsleep_ms, speed=0.0):
+    """Run one parameter set over the whole trace; returns the per-frame metrics columns"""
+    engine = settings.create_engine(threshold)
+    engine.state_hold_ms = state_hold_ms
+    engine.microsleep_ms = microsleep_ms
+    start = float(trace.timestamps[0]) if len(trace) else 0.0
+    engine.reset(start_time=start)
+    rows = {name: [] for name in COLUMNS}
+    w, h = trace.width, trace.height
+    wall_start = time.perf_counter()
+
+    for i in range(len(trace)):
+        timestamp = float(trace.timestamps[i])
+        if speed:
+            # Paced replay (speed=1 is real time), e.g. to watch the Arduino bridge react
+            delay = (timestamp - start) / speed - (time.perf_counter() - wall_start)
+            if delay > 0:
+                time.sleep(delay)
+        face = trace.face[i]
+        if face:
+            engine.step(trace.points[i], timestamp, w, h)
+        else:
+            engine.no_face()
+        record_frame(rows, i, timestamp - start, engine, face)
+    return to_columns(rows)
+
+
+def summarize(columns, elapsed):
+    """One result row: time share per status, episodes and replay speed"""
+    frames = len(columns["frame"])
+    status = columns["status"]
+    entered_sleep = np.flatnonzero((status[1:] == SLEEPING) & (status[:-1] != SLEEPING))
+    first_sleep = columns["time"][entered_sleep[0] + 1] if len(entered_sleep) else None
+    return {
+        "frames": frames,
+        "sleeping_pct": 100 * np.count_nonzero(status == SLEEPING) / max(frames, 1),
+        "drowsy_pct": 100 * np.count_nonzero(status == DROWSY) / max(frames, 1),
+        "sleep_alerts": len(entered_sleep) + int(frames > 0 and status[0] == SLEEPING),
+        "first_sleep_sec": first_sleep,
+        "microsleeps": int(columns["microsleep_count"][-1]) if frames else 0,
+        "blinks": int(columns["total_blinks"][-1]) if frames else 0,
+        "replay_fps": frames / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay landmark traces through the detector state machine")
+    parser.add_argument('traces', nargs='+', help='.slt trace files')
+    parser.add_argument('--threshold', type=float, nargs='+', default=[settings.DEFAULT_EAR_THRESHOLD],
+                        help='EAR threshold(s) to try (default: %(default)s)')
+    parser.add_argument('--state-hold-ms', type=float, nargs='+', default=[settings.STATE_HOLD_MS],
+                        help='How long a state must persist (engine.state_hold_ms) to try (default: %(default)s)')
+    parser.add_argument('--microsleep-ms', type=float, nargs='+', default=[settings.MICROSLEEP_MS],
+                        help='Eye closure that counts as a microsleep to try (default: %(default)s)')
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help='Pace the replay (1 = real time); 0 = as fast as possible')
+    parser.add_argument('--metrics', help='Write per-frame metrics of each run to this directory')
+    parser.add_argument('--format', choices=('npz', 'csv'), default='npz')
+    args = parser.parse_args()
+
+    if args.metrics:
+        Path(args.metrics).mkdir(parents=True, exist_ok=True)
+    grid = list(itertools.product(args.threshold, args.state_hold_ms, args.microsleep_ms))
+
+    for path in args.traces:
+        trace = LandmarkTrace(path)
+        print(f"{path}: {len(trace)} frames, {trace.duration():.1f}s, "
+              f"{np.count_nonzero(trace.face)} with a face, {trace.width}x{trace.height}")
+        print(f"  {'thresh':>6s} {'hold ms':>7s} {'micro ms':>8s} | {'sleep%':>6s} {'drowsy%':>7s} "
+              f"{'alerts':>6s} {'1st sleep':>9s} {'microsl':>7s} {'blinks':>6s} | {'fps':>7s}")
+        for threshold, hold, micro in grid:
+            began = time.perf_counter()
+            columns = replay(trace, threshold, hold, micro, args.speed)
+            r = summarize(columns, time.perf_counter() - began)
+            first = f"{r['first_sleep_sec']:.1f}s" if r['first_sleep_sec'] is not None else "-"
+            print(f"  {threshold:6.3f} {hold:7.0f} {micro:8.0f} | {r['sleeping_pct']:6.1f} {r['drowsy_pct']:7.1f} "
+                  f"{r['sleep_alerts']:6d} {first:>9s} {r['microsleeps']:7d} {r['blinks']:6d} | "
+                  f"{r['replay_fps']:7.0f}")
+            if args.metrics:
+                name = f"{Path(path).stem}_t{threshold:g}_h{hold:g}_m{micro:g}"
+                fps = trace.fps or (len(trace) / trace.duration() if trace.duration() else 30.0)
+                save_metrics(columns, Path(args.metrics) / name, fps, args.format)
+
+
+if __name__ == '__main__':
+    main()
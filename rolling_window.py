@@ -0,0 +1,78 @@
+"""
+Constant-time rolling windows for the sleepiness score
+Fixed-size ring buffers with a running sum: each push is O(1) (amortized for time windows),
+so long windows cost no more CPU per frame than short ones.
+"""
+
+
+class FrameWindow:
+    """Running sum over the last `size` samples"""
+
+    def __init__(self, size):
+        self.size = int(size)
+        self._values = [0] * self.size
+        self._head = 0
+        self.count = 0
+        self.total = 0
+
+    def push(self, value, timestamp=None):
+        if self.count == self.size:
+            self.total -= self._values[self._head]
+        else:
+            self.count += 1
+        self._values[self._head] = value
+        self.total += value
+        self._head = (self._head + 1) % self.size
+
+    def clear(self):
+        self._head = self.count = self.total = 0
+
+
+class TimeWindow:
+    """Running sum over samples newer than `seconds`; the ring grows (doubling) if the frame rate needs it"""
+
+    def __init__(self, seconds, capacity=256):
+        self.seconds = float(seconds)
+        self._values = [0] * capacity
+        self._stamps = [0.0] * capacity
+        self._head = 0      # next write slot
+        self.count = 0
+        self.total = 0
+
+    def _grow(self):
+        cap = len(self._values)
+        tail = (self._head - self.count) % cap
+        order = [(tail + i) % cap for i in range(self.count)]
+        self._values = [self._values[i] for i in order] + [0] * cap
+        self._stamps = [self._stamps[i] for i in order] + [0.0] * cap
+        self._head = self.count
+
+    def push(self, value, timestamp):
+        self.expire(timestamp)
+        if self.count == len(self._values):
+            self._grow()
+        cap = len(self._values)
+        self._values[self._head] = value
+        self._stamps[self._head] = timestamp
+        self._head = (self._head + 1) % cap
+        self.count += 1
+        self.total += value
+
+    def expire(self, now):
+        cap = len(self._values)
+        cutoff = now - self.seconds
+        tail = (self._head - self.count) % cap
+        while self.count and self._stamps[tail] < cutoff:
+            self.total -= self._values[tail]
+            tail = (tail + 1) % cap
+            self.count -= 1
+
+    def clear(self):
+        self._head = self.count = self.total = 0
+
+
+def percentage(window, max_value=2):
+    """Weighted percentage of the window: total / (max_value * count) * 100"""
+    if not window.count:
+        return 0
+    return (window.total / (max_value * window.count)) * 100
@@ -1,28 +1,39 @@
 import cv2
-import mediapipe as mp
 import numpy as np
 import threading
 import os
-import platform
+import logging
 import json
 import time
+import sys
 from datetime import datetime
 from collections import deque
-
-# Initialize MediaPipe Face Mesh
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(
-    min_detection_confidence=0.7,
-    min_tracking_confidence=0.7
-)
-mp_drawing = mp.solutions.drawing_utils
-drawing_spec = mp_drawing.DrawingSpec(thickness=1, circle_radius=1)
-
-# Constants for detection
-DEFAULT_EAR_THRESHOLD = 0.23  # Keep default threshold constant
-CONSEC_FRAMES = 16
-ALEART = True
-MICROSLEEP_FRAMES = 30  # Frames indicating microsleep
+from frame_pipeline import FramePipeline
+from adaptive_inference import AdaptiveScheduler
+from telemetry import Telemetry
+from threshold_store import ThresholdRepository
+from calibration import CalibrationStore, EarCalibrator
+from detector_log import RateLimitFilter, setup_logging, shutdown_logging
+from landmark_trace import TraceWriter
+from alert_dispatcher import AlertDispatcher, ConsoleSink, AudioSink, SerialSink, HttpSink
+from status_store import StatusPublisher, HttpStatusSink
+from status_channel import StatusChannelWriter, channel_name
+import detector_settings
+from detector_settings import (DEFAULT_EAR_THRESHOLD, DEFAULT_DROWSY_BAND, TREND_WINDOWS_SEC,
+                               create_face_mesh)
+from drowsiness_engine import STATUS_ACTIVE, STATUS_DROWSY, STATUS_SLEEPING
+from head_pose import MODEL_POINTS, DIST_COEFFS, camera_matrix_for, rotation_to_angles, ZERO_POSE
+
+# Detection constants (threshold, timing, windows) and the Face Mesh / engine factories
+# live in detector_settings, which offline tools import without this module's setup.
+# The Face Mesh graph itself is only built in main().
+ALEART = True  # Console alerts
+# Alert sinks and pacing (see alert_dispatcher): a sustained alert repeats every
+# ALERT_COOLDOWN_SEC and escalates after 5 s / 10 s of continuous sleep
+ALERT_AUDIO = False       # Beep through sounddevice
+ALERT_SERIAL_PORT = None  # Buzzer board, e.g. "COM4" (not the port IoT/display.py drives)
+ALERT_URL = None          # POST alerts as JSON, e.g. a paging webhook
+ALERT_COOLDOWN_SEC = 3.0
 
 JSON_DIR = "JSON"
 os.makedirs(JSON_DIR, exist_ok=True)
@@ -35,92 +46,87 @@ VEHICLE_INFO = {
     "type": "car"
 }
 
-def write_vehicle_status(state: str, percentage: float): # ADD 'percentage' argument
-    """Write a single-vehicle entry to the shared JSON file."""
-    entry = {
-        "id": VEHICLE_INFO["id"],
-        "name": VEHICLE_INFO["name"],
-        "type": VEHICLE_INFO["type"],
-        "status": state,                     # exact string shown on screen
-        "sleep_percentage": round(percentage, 1), # NEW: Add the calculated percentage (rounded to 1 decimal)
-        "last_update": datetime.now().isoformat()
-    }
-
-    # Load existing data (if any) → always keep a list
-    if os.path.exists(JSON_FILE_PATH):
-        try:
-            with open(JSON_FILE_PATH, "r") as f:
-                data = json.load(f)
-            if not isinstance(data, list):
-                data = []
-        except json.JSONDecodeError:
-            data = []
-    else:
-        data = []
-
-    # Replace entry for this driver (or append if missing)
-    data = [d for d in data if d.get("id") != VEHICLE_INFO["id"]]
-    data.append(entry)
+# Status goes to this vehicle's shared-memory channel, channel_name(VEHICLE_INFO["id"])
+# (read by web/app.py and IoT/display.py). The JSON file is kept for compatibility and lists
+# every local vehicle: status changes are flushed immediately, percentage drift at most
+# every STATUS_FLUSH_SEC
+WRITE_JSON_STATUS = True
+STATUS_FLUSH_SEC = 0.5
+STATUS_HEARTBEAT_SEC = 5.0
+# Fleet dashboard ingestion endpoint (e.g. "http://127.0.0.1:5000/api/ingest"); None disables
+INGEST_URL = None
+status_publisher = StatusPublisher(JSON_FILE_PATH, VEHICLE_INFO,
+                                   flush_interval=STATUS_FLUSH_SEC,
+                                   heartbeat_interval=STATUS_HEARTBEAT_SEC,
+                                   write_json=WRITE_JSON_STATUS)
 
-    # Write back
-    with open(JSON_FILE_PATH, "w") as f:
-        json.dump(data, f, indent=2)
-
-# Variables for tracking state
-sleep = drowsy = active = 0
-status = ""
-color = (0, 0, 0)
-box_color = (0, 0, 0)
+def write_vehicle_status(state: str, percentage: float): # ADD 'percentage' argument
+    """Publish this vehicle's entry; the shared JSON file is rewritten only when needed."""
+    return status_publisher.publish(state, percentage)
+
+# Overlay colors per status (BGR)
+STATUS_COLORS = {
+    STATUS_SLEEPING: (0, 0, 255),
+    STATUS_DROWSY: (255, 0, 255),
+    STATUS_ACTIVE: (0, 255, 0)
+}
 
 # Variable for adjustable threshold
 current_threshold = DEFAULT_EAR_THRESHOLD
+drowsy_band = DEFAULT_DROWSY_BAND
+
+# Per-driver calibration: the first CALIBRATION_SEC of face time set this driver's threshold
+# and drowsy band, stored in CALIBRATION_FILE under VEHICLE_INFO["id"] (see calibration.py)
+CALIBRATION_SEC = 30.0  # 0 disables automatic calibration
+CALIBRATION_FILE = os.path.join(JSON_DIR, "driver_calibration.json")
+calibrator = None  # EarCalibrator while a calibration is running
 
 # Variables for custom threshold input
 input_mode = False
 input_text = ""
 input_counter = 0  # For cursor blinking
 
-# Variables for saving thresholds
-
-if not os.path.exists(os.path.join("JSON")):
-    os.mkdir("JSON")
-if not os.path.exists(os.path.join("JSON","saved_thresholds.json")):
-    with open(os.path.join('JSON','saved_thresholds.json'), "w") as f:
-        json.dump([],f,indent=4)
-
-
-if not os.path.exists(os.path.join("JSON","saved_thresholds.json")):
-    os.mkdir("JSON")
-
-save_thresholds_file = os.path.join("JSON","saved_thresholds.json")
-saved_thresholds = []
-recently_used = []  # List to track recently used thresholds
+# Saved thresholds: indexed by name, most recently used first, written to disk in the
+# background THRESHOLD_FLUSH_SEC after the last change (see threshold_store)
+save_thresholds_file = os.path.join(JSON_DIR, "saved_thresholds.json")
 MAX_RECENT = 5  # Maximum number of recently used thresholds to track
+THRESHOLD_FLUSH_SEC = 1.0
+threshold_store = ThresholdRepository(save_thresholds_file, DEFAULT_EAR_THRESHOLD,
+                                      max_recent=MAX_RECENT, flush_delay=THRESHOLD_FLUSH_SEC)
 naming_mode = False  # Whether we're in naming mode for a new threshold
 name_input = ""
 name_counter = 0  # For cursor blinking in name input
 threshold_menu_open = False  # Whether threshold selection menu is open
 current_threshold_name = "Default"  # Name of the currently selected threshold
 
-# Variables for head pose
-head_pose_angles = {'pitch': 0, 'yaw': 0, 'roll': 0}
+# Adaptive inference: crop Face Mesh to the face and skip frames while stably active
+ADAPTIVE_INFERENCE = True
+inference_scheduler = AdaptiveScheduler() if ADAPTIVE_INFERENCE else None
 
-# Variables for blink detection
-blink_duration = 0
-total_blinks = 0
-last_blink_time = 0
-blink_frequency = 0
-microsleep_counter = 0
-session_start_time = time.time()
+# Glass-to-alert latency of the last processed frame (capture → status decided)
+pipeline_latency_ms = 0.0
 
-# Variable for sleepiness percentage
-sleep_percentage = 0
-sleep_history = []  # To keep track of recent states for percentage calculation
-MAX_HISTORY = 100  # Number of frames to consider for percentage
+# Per-stage timings (p50/p95/p99), FPS and drops; snapshot served by web/app.py /api/metrics
+TELEMETRY_PATH = os.path.join(JSON_DIR, "detector_metrics.json")
+telemetry = Telemetry(TELEMETRY_PATH)
 
-# Terminal message counter and limit
-terminal_msg_count = 0
-TERMINAL_MSG_LIMIT = 50  # Clear terminal after this many messages
+def create_engine(threshold=None):
+    """New detection engine with the current threshold and drowsy band"""
+    return detector_settings.create_engine(current_threshold if threshold is None else threshold,
+                                           drowsy_band)
+
+# This driver's detection state: EAR, head pose, blinks, status and sleepiness
+engine = create_engine()
+
+# Logging: console + rotating LOG_FILE, written by a background thread (see detector_log).
+# Repetitive hot-loop messages are rate limited per template: (burst, seconds per extra message)
+LOG_FILE = os.path.join("logs", "detector.log")
+LOG_RATE_LIMITS = {
+    "Status changed to: %s (EAR: %.2f)": (5, 2.0),
+    "Sleepiness at %.1f%%!": (1, 10.0),
+    "Microsleep detected! Duration: %d ms": (3, 5.0),
+}
+log = logging.getLogger("sleep_detector")
 
 # Add these near the other global variables (around line 30)
 edit_counter = 0
@@ -137,54 +143,13 @@ current_state = None
 current_state_start = None
 # ===============================================
 
-def clear_terminal():
-    """Clear terminal screen based on OS"""
-    system_name = platform.system()
-    if system_name == "Windows":
-        os.system("cls")
-    else:  # For Linux and MacOS
-        os.system("clear")
-
-def print_with_counter(message):
-    """Print message and increment counter, clear terminal if needed"""
-    global terminal_msg_count
-    
-    print(message)
-    terminal_msg_count += 1
-    
-    if terminal_msg_count >= TERMINAL_MSG_LIMIT:
-        clear_terminal()
-        print("--- Terminal cleared after 50 messages ---")
-        print(message)  # Reprint the current message after clearing
-        terminal_msg_count = 1  # Reset counter (count the message we just printed)
+def start_logging():
+    """Route logging through the background writer (console + rotating file)"""
+    return setup_logging(LOG_FILE, rate_limit=RateLimitFilter(overrides=LOG_RATE_LIMITS))
 
 def load_thresholds():
-    global saved_thresholds
-    try:
-        if os.path.exists(save_thresholds_file):
-            with open(save_thresholds_file, 'r') as f:
-                data = json.load(f)
-                saved_thresholds = data.get('thresholds', [])
-                # Ensure values are floats
-                for t in saved_thresholds:
-                    t['value'] = float(t['value'])  # ADDED
-                print_with_counter(f"Loaded {len(saved_thresholds)} saved thresholds")
-        else:
-            # Create default entry if file doesn't exist
-            saved_thresholds = [{'name': 'Default', 'value': DEFAULT_EAR_THRESHOLD, 'last_used': datetime.now().isoformat()}]
-            save_thresholds_to_file()
-    except Exception as e:
-        print_with_counter(f"Error loading thresholds: {e}")
-        saved_thresholds = [{'name': 'Default', 'value': DEFAULT_EAR_THRESHOLD, 'last_used': datetime.now().isoformat()}]
-
-def save_thresholds_to_file():
-    """Save thresholds to file"""
-    try:
-        with open(save_thresholds_file, 'w') as f:
-            json.dump({'thresholds': saved_thresholds}, f, indent=2)
-        print_with_counter(f"Saved {len(saved_thresholds)} thresholds to file")
-    except Exception as e:
-        print_with_counter(f"Error saving thresholds: {e}")
+    count = threshold_store.load()
+    log.info(f"Loaded {count} saved thresholds")
 
 # ===== NEW: Save state history =====
 def save_state_history():
@@ -192,184 +157,148 @@ def save_state_history():
     try:
         with open(os.path.join("JSON","state_history.json"), "w") as f:
             json.dump(state_history, f, indent=2, default=str)
-        print_with_counter("Saved state history to file")
+        log.info("Saved state history to file")
     except Exception as e:
-        print_with_counter(f"Error saving state history: {e}")
+        log.error(f"Error saving state history: {e}")
 # ===================================
 
-def add_to_recently_used(threshold_info):
-    """Add a threshold to recently used list"""
-    global recently_used
-    
-    # Update the "last_used" timestamp for the threshold
-    for t in saved_thresholds:
-        if t['name'] == threshold_info['name']:
-            t['last_used'] = datetime.now().isoformat()
-    
-    # Add to recently used (avoiding duplicates)
-    for i, item in enumerate(recently_used):
-        if item['name'] == threshold_info['name']:
-            recently_used.pop(i)
-            break
-    
-    # Add to front of list
-    recently_used.insert(0, threshold_info)
-    
-    # Limit the size
-    if len(recently_used) > MAX_RECENT:
-        recently_used.pop()
-    
-    # Save updated "last_used" capaces
-    save_thresholds_to_file()
-
 def save_current_threshold(name):
     """Save current threshold with given name"""
-    global saved_thresholds, current_threshold, current_threshold_name
+    global current_threshold_name
     
-    # Check if name already exists
-    for t in saved_thresholds:
-        if t['name'].lower() == name.lower():
-            # Update existing threshold
-            t['value'] = current_threshold
-            t['last_used'] = datetime.now().isoformat()
-            print_with_counter(f"Updated threshold '{name}' with value {current_threshold}")
-            current_threshold_name = name
-            save_thresholds_to_file()
-            return
+    entry, created = threshold_store.put(name, current_threshold)
+    current_threshold_name = entry['name']
+    if created:
+        log.info(f"Saved new threshold '{name}' with value {current_threshold}")
+    else:
+        log.info(f"Updated threshold '{name}' with value {current_threshold}")
+
+def apply_saved_threshold(name):
+    """Make a saved threshold current by name (menu click, --threshold-name, headless commands)"""
+    global current_threshold, current_threshold_name
     
-    # Add new threshold
-    new_threshold = {
-        'name': name,
-        'value': current_threshold,
-        'last_used': datetime.now().isoformat()
-    }
+    t = threshold_store.touch(name)
+    if t is None:
+        log.warning(f"Threshold '{name}' not found")
+        return False
+    current_threshold = float(t['value'])
+    current_threshold_name = t['name']
+    log.info(f"Applied threshold '{t['name']}' with value {t['value']}")
+    return True
+
+def set_threshold(value, name="Custom"):
+    """Set the EAR threshold directly; returns False if out of range"""
+    global current_threshold, current_threshold_name
     
-    saved_thresholds.append(new_threshold)
+    value = float(value)
+    if not 0 < value < 1:
+        log.warning("Invalid threshold value. Must be between 0 and 1")
+        return False
+    current_threshold = round(value, 2)
     current_threshold_name = name
-    print_with_counter(f"Saved new threshold '{name}' with value {current_threshold}")
-    
-    # Add to recently used
-    add_to_recently_used(new_threshold)
-    
-    # Save to file
-    save_thresholds_to_file()
+    log.info(f"Threshold set to: {current_threshold}")
+    return True
 
 def delete_threshold(name):
     """Delete a threshold from saved thresholds"""
-    global saved_thresholds, current_threshold_name, current_threshold
+    global current_threshold_name, current_threshold
     
-    for i, t in enumerate(saved_thresholds):
-        if t['name'].lower() == name.lower():
-            deleted_threshold = saved_thresholds.pop(i)
-            print_with_counter(f"Deleted threshold '{name}' with value {deleted_threshold['value']}")
-            
-            # If deleted threshold was current, revert to default
-            if current_threshold_name == name:
-                current_threshold_name = "Default"
-                current_threshold = DEFAULT_EAR_THRESHOLD
-                print_with_counter(f"Reverted to Default threshold: {current_threshold}")
-            
-            # Remove from recently_used if present
-            for i, item in enumerate(recently_used):
-                if item['name'] == name:
-                    recently_used.pop(i)
-                    break
-                    
-            save_thresholds_to_file()
-            return True
-    print_with_counter(f"Threshold '{name}' not found")
-    return False
+    deleted_threshold = threshold_store.delete(name)
+    if deleted_threshold is None:
+        log.warning(f"Threshold '{name}' not found")
+        return False
+    log.info(f"Deleted threshold '{name}' with value {deleted_threshold['value']}")
+    
+    # If deleted threshold was current, revert to default
+    if current_threshold_name.lower() == name.lower():
+        current_threshold_name = "Default"
+        current_threshold = DEFAULT_EAR_THRESHOLD
+        log.info(f"Reverted to Default threshold: {current_threshold}")
+    return True
 
 def edit_threshold(name, new_value):
+    global current_threshold
     try:
         new_value = float(new_value)
-        if 0 < new_value < 1:
-            for t in saved_thresholds:
-                if t['name'].lower() == name.lower():
-                    old_value = t['value']
-                    t['value'] = round(float(new_value), 2)  # FIXED
-                    t['last_used'] = datetime.now().isoformat()
-                    print_with_counter(f"Edited threshold '{name}' from {old_value} to {new_value}")
-                    
-                    # Update current threshold if this was the active one
-                    if current_threshold_name == name:
-                        current_threshold = new_value
-                    
-                    save_thresholds_to_file()
-                    return True
-            print_with_counter(f"Threshold '{name}' not found")
-            return False
-        else:
-            print_with_counter("Invalid threshold value. Must be between 0 and 1")
-            return False
     except ValueError:
-        print_with_counter("Invalid input. Please enter a numeric value")
+        log.warning("Invalid input. Please enter a numeric value")
         return False
-
-def play_ALEART():
-    """Function to display alert when sleeping is detected"""
+    if not 0 < new_value < 1:
+        log.warning("Invalid threshold value. Must be between 0 and 1")
+        return False
+    
+    entry = threshold_store.get(name)
+    old_value = entry['value'] if entry is not None else None
+    if threshold_store.edit(name, round(new_value, 2)) is None:
+        log.warning(f"Threshold '{name}' not found")
+        return False
+    log.info(f"Edited threshold '{name}' from {old_value} to {new_value}")
+    
+    # Update current threshold if this was the active one
+    if current_threshold_name.lower() == name.lower():
+        current_threshold = round(new_value, 2)
+    return True
+
+def apply_calibration(profile):
+    """Use a calibration profile's threshold and drowsy band"""
+    global current_threshold, current_threshold_name, drowsy_band
+    current_threshold = profile['threshold']
+    current_threshold_name = "Calibrated"
+    drowsy_band = engine.drowsy_band = profile['drowsy_band']
+
+def finish_calibration(store, driver_id):
+    """Derive the driver's profile from the collected EAR; keep the current settings if unusable"""
+    global calibrator
+    profile = calibrator.result()
+    calibrator = None
+    if profile is None:
+        log.warning(f"Calibration failed, keeping threshold {current_threshold}")
+        return
+    apply_calibration(profile)
+    store.put(driver_id, profile)
+    log.info(f"Calibrated '{driver_id}': threshold {profile['threshold']}, drowsy band "
+             f"{profile['drowsy_band']} (open-eye EAR {profile['open_ear']}, {profile['samples']} frames)")
+
+def create_alert_dispatcher():
+    """Long-lived alert thread with the sinks enabled above"""
+    sinks = []
     if ALEART:
-        print_with_counter("ALERT: Wake up!")
+        sinks.append(ConsoleSink(log.warning))
+    if ALERT_AUDIO:
+        sinks.append(AudioSink())
+    if ALERT_SERIAL_PORT:
+        try:
+            sinks.append(SerialSink(ALERT_SERIAL_PORT))
+        except (ImportError, OSError) as e:
+            log.warning(f"Serial alert sink unavailable: {e}")
+    if ALERT_URL:
+        sinks.append(HttpSink(ALERT_URL))
+    return AlertDispatcher(sinks, cooldown_sec=ALERT_COOLDOWN_SEC, source=VEHICLE_INFO["id"])
 
 def eye_aspect_ratio(eye):
-    """Calculate Eye Aspect Ratio (EAR)"""
+    """Calculate Eye Aspect Ratio (EAR) for one eye; see landmarks.eye_aspect_ratio_batch for arrays"""
     A = np.linalg.norm(eye[1] - eye[5])
     B = np.linalg.norm(eye[2] - eye[4])
     C = np.linalg.norm(eye[0] - eye[3])
     ear = (A + B) / (2.0 * C)
     return ear
 
-def calculate_head_pose(face_landmarks, frame_width, frame_height):
-    """Calculate head pose angles (pitch, yaw, roll)"""
-    # 3D model points (generic face model)
-    model_points = np.array([
-        (0.0, 0.0, 0.0),             # Nose tip
-        (0.0, -330.0, -65.0),        # Chin
-        (-225.0, 170.0, -135.0),     # Left eye left corner
-        (225.0, 170.0, -135.0),      # Right eye right corner
-        (-150.0, -150.0, -125.0),    # Left Mouth corner
-        (150.0, -150.0, -125.0)      # Right mouth corner
-    ])
-    
-    # 2D image points from face landmarks
-    image_points = np.array([
-        (face_landmarks.landmark[1].x * frame_width, face_landmarks.landmark[1].y * frame_height),     # Nose tip
-        (face_landmarks.landmark[175].x * frame_width, face_landmarks.landmark[175].y * frame_height),  # Chin
-        (face_landmarks.landmark[33].x * frame_width, face_landmarks.landmark[33].y * frame_height),    # Left eye left corner
-        (face_landmarks.landmark[263].x * frame_width, face_landmarks.landmark[263].y * frame_height),  # Right eye right corner
-        (face_landmarks.landmark[61].x * frame_width, face_landmarks.landmark[61].y * frame_height),    # Left mouth corner
-        (face_landmarks.landmark[291].x * frame_width, face_landmarks.landmark[291].y * frame_height)   # Right mouth corner
-    ], dtype="double")
-    
-    # Camera internals
-    focal_length = frame_width
-    center = (frame_width/2, frame_height/2)
-    camera_matrix = np.array(
-        [[focal_length, 0, center[0]],
-         [0, focal_length, center[1]],
-         [0, 0, 1]], dtype="double"
-    )
-    
-    # Assuming no lens distortion
-    dist_coeffs = np.zeros((4,1))
+def calculate_head_pose(pose_points, frame_width, frame_height):
+    """
+    One-shot (cold) head pose from the (6, 2) pixel points in POSE_IDX order.
+    The live loop uses engine.head_pose, which caches intrinsics and warm-starts solvePnP.
+    """
+    # 2D image points: nose tip, chin, left/right eye corner, left/right mouth corner
+    image_points = np.ascontiguousarray(pose_points, dtype="double")
+    camera_matrix = camera_matrix_for(frame_width, frame_height)
     
     # Solve PnP
-    success, rotation_vector, translation_vector = cv2.solvePnP(model_points, image_points, camera_matrix, dist_coeffs)
+    success, rotation_vector, translation_vector = cv2.solvePnP(MODEL_POINTS, image_points, camera_matrix, DIST_COEFFS)
     
     if success:
-        # Convert rotation vector to rotation matrix
-        rotation_matrix, _ = cv2.Rodrigues(rotation_vector)
-        
-        # Calculate Euler angles
-        angles = cv2.RQDecomp3x3(rotation_matrix)[0]
-        
-        return {
-            'pitch': angles[0],
-            'yaw': angles[1], 
-            'roll': angles[2]
-        }
+        return rotation_to_angles(rotation_vector)
     
-    return {'pitch': 0, 'yaw': 0, 'roll': 0}
+    return dict(ZERO_POSE)
 
 def draw_button(frame, text, position, width, height, color=(200, 200, 200), text_color=(0, 0, 0)):
     """Draw a button on the frame"""
@@ -389,7 +318,7 @@ def draw_button(frame, text, position, width, height, color=(200, 200, 200), tex
 def draw_threshold_menu(frame):
     """Draw the threshold selection menu with edit and delete options"""
     # Background for the menu
-    menu_height = min(400, 50 + len(saved_thresholds) * 60 + 60)
+    menu_height = min(400, 50 + len(threshold_store) * 60 + 60)
     menu_width = 300
     menu_x = (frame.shape[1] - menu_width) // 2
     menu_y = (frame.shape[0] - menu_height) // 2
@@ -411,12 +340,8 @@ def draw_threshold_menu(frame):
     buttons = []
     y_offset = menu_y + 60
     
-    # Sort thresholds by most recently used
-    sorted_thresholds = sorted(saved_thresholds, 
-                             key=lambda x: x.get('last_used', '1970-01-01'), 
-                             reverse=True)
-    
-    for t in sorted_thresholds:
+    # Most recently used first (kept in that order by the store, no per-frame sort)
+    for t in threshold_store.newest_first():
         # FIXED: Convert value to float before formatting
         btn = draw_button(frame, f"{t['name']}: {float(t['value']):.2f}", 
                          (menu_x + 10, y_offset), menu_width - 100, 30, 
@@ -454,7 +379,6 @@ def truncate_text(text, max_length):
 def handle_mouse_click(event, x, y, flags, param):
     global current_threshold, input_mode, input_text, naming_mode, name_input
     global threshold_menu_open, edit_mode, edit_threshold_name, edit_input
-    global current_threshold_name, recently_used  # ADDED
     
     if event != cv2.EVENT_LBUTTONDOWN:
         return
@@ -468,11 +392,8 @@ def handle_mouse_click(event, x, y, flags, param):
                     return
                 elif button_type == 'threshold':
                     # Apply selected threshold
-                    current_threshold = float(button_data['value'])
-                    current_threshold_name = button_data['name']
-                    add_to_recently_used(button_data)
+                    apply_saved_threshold(button_data['name'])
                     threshold_menu_open = False
-                    print_with_counter(f"Applied threshold '{button_data['name']}' with value {button_data['value']}")
                     return
                 elif button_type == 'delete':
                     delete_threshold(button_data['name'])
@@ -481,7 +402,7 @@ def handle_mouse_click(event, x, y, flags, param):
                     edit_mode = True
                     edit_threshold_name = button_data['name']
                     edit_input = str(button_data['value'])
-                    print_with_counter(f"Editing threshold '{button_data['name']}'")
+                    log.info(f"Editing threshold '{button_data['name']}'")
                     return
         return
     
@@ -496,7 +417,7 @@ def handle_mouse_click(event, x, y, flags, param):
         if inc_btn[0] <= x <= inc_btn[2] and inc_btn[1] <= y <= inc_btn[3]:
             current_threshold += 0.01
             current_threshold = round(current_threshold, 2)
-            print_with_counter(f"Threshold increased to: {current_threshold}")
+            log.info(f"Threshold increased to: {current_threshold}")
             return
             
         # Check decrease button
@@ -504,7 +425,7 @@ def handle_mouse_click(event, x, y, flags, param):
         if dec_btn[0] <= x <= dec_btn[2] and dec_btn[1] <= y <= dec_btn[3]:
             current_threshold -= 0.01
             current_threshold = max(0.01, round(current_threshold, 2))  # Prevent negative threshold
-            print_with_counter(f"Threshold decreased to: {current_threshold}")
+            log.info(f"Threshold decreased to: {current_threshold}")
             return
             
         # Check custom input button
@@ -512,7 +433,7 @@ def handle_mouse_click(event, x, y, flags, param):
         if input_btn[0] <= x <= input_btn[2] and input_btn[1] <= y <= input_btn[3]:  # Changed inc_btn to input_btn
             input_mode = True
             input_text = ""
-            print_with_counter("Custom threshold input mode: active")
+            log.info("Custom threshold input mode: active")
             return
             
         # Check save button
@@ -520,14 +441,14 @@ def handle_mouse_click(event, x, y, flags, param):
         if save_btn[0] <= x <= save_btn[2] and save_btn[1] <= y <= save_btn[3]:
             naming_mode = True
             name_input = ""
-            print_with_counter("Enter a name for this threshold")
+            log.info("Enter a name for this threshold")
             return
             
         # Check load button
         load_btn = param['load_btn']
         if load_btn[0] <= x <= load_btn[2] and load_btn[1] <= y <= load_btn[3]:  # FIXED
             threshold_menu_open = True
-            print_with_counter("Opening threshold selection menu")
+            log.info("Opening threshold selection menu")
             return
 
 def handle_keyboard_input(key):
@@ -560,7 +481,7 @@ def handle_keyboard_input(key):
             edit_mode = False
             edit_input = ""
             edit_threshold_name = ""
-            print_with_counter("Edit cancelled")
+            log.info("Edit cancelled")
             return
             
         # Add character if valid (numbers and decimal)
@@ -579,11 +500,11 @@ def handle_keyboard_input(key):
                 value = float(input_text)
                 if 0 < value < 1:  # Reasonable threshold range
                     current_threshold = round(value, 2)
-                    print_with_counter(f"Threshold set to custom value: {current_threshold}")
+                    log.info(f"Threshold set to custom value: {current_threshold}")
                 else:
-                    print_with_counter("Invalid threshold value. Please enter a value between 0 and 1.")
+                    log.warning("Invalid threshold value. Please enter a value between 0 and 1.")
             except ValueError:
-                print_with_counter("Invalid input. Please enter a numeric value.")
+                log.warning("Invalid input. Please enter a numeric value.")
             
             input_mode = False
             input_text = ""
@@ -616,7 +537,7 @@ def handle_keyboard_input(key):
             if name_input.strip():
                 save_current_threshold(name_input.strip())
             else:
-                print_with_counter("Name cannot be empty. Cancelled.")
+                log.info("Name cannot be empty. Cancelled.")
             
             naming_mode = False
             name_input = ""
@@ -631,7 +552,7 @@ def handle_keyboard_input(key):
         if key == 27:  # Escape key
             naming_mode = False
             name_input = ""
-            print_with_counter("Threshold naming cancelled")
+            log.info("Threshold naming cancelled")
             return
             
         # Add character if valid (allow letters, numbers, spaces, hyphens, underscores)
@@ -639,30 +560,6 @@ def handle_keyboard_input(key):
             name_input += chr(key)
             return
 
-def update_sleep_percentage(state):
-    """Update sleep percentage based on current state"""
-    global sleep_percentage, sleep_history
-    
-    # Add current state to history
-    if state == "SLEEPING !!!":
-        sleep_history.append(2)
-    elif state == "Drowsy !":
-        sleep_history.append(1)
-    else:
-        sleep_history.append(0)
-    
-    # Limit history size
-    if len(sleep_history) > MAX_HISTORY:
-        sleep_history.pop(0)
-    
-    # Calculate weighted sleep percentage
-    if sleep_history:
-        total = sum(sleep_history)
-        max_possible = 2 * len(sleep_history)
-        sleep_percentage = (total / max_possible) * 100
-    else:
-        sleep_percentage = 0
-
 # ===== NEW: State tracking with timestamps =====
 def update_state_history(new_state):
     """Update state history when state changes"""
@@ -689,55 +586,266 @@ def update_state_history(new_state):
         current_state_start = current_time
 # ===============================================
 
-def calculate_blink_rate():
-    """Calculate blink rate in blinks per minute"""
-    global blink_frequency, total_blinks, session_start_time
+def draw_controls(frame, button_params, dropped=0):
+    """Buttons, input dialogs, threshold menu and status overlays (skipped in headless mode)"""
+    global input_counter, name_counter, edit_counter
+    
+    # Draw threshold adjustment buttons
+    btn_width, btn_height = 80, 40
+    inc_btn = draw_button(frame, "Thresh+", (10, frame.shape[0] - 50), btn_width, btn_height)
+    dec_btn = draw_button(frame, "Thresh-", (100, frame.shape[0] - 50), btn_width, btn_height)
+    input_btn = draw_button(frame, "Custom", (190, frame.shape[0] - 50), btn_width, btn_height)
+    save_btn = draw_button(frame, "Save", (280, frame.shape[0] - 50), btn_width, btn_height)
+    load_btn = draw_button(frame, "Load", (370, frame.shape[0] - 50), btn_width, btn_height)
+
+    button_params['inc_btn'] = inc_btn
+    button_params['dec_btn'] = dec_btn
+    button_params['input_btn'] = input_btn
+    button_params['save_btn'] = save_btn
+    button_params['load_btn'] = load_btn
     
-    current_time = time.time()
-    session_duration = current_time - session_start_time
+    # Draw custom input field if active
+    if input_mode:
+        overlay = frame.copy()
+        cv2.rectangle(overlay, (0, 0), (frame.shape[1], frame.shape[0]), (0, 0, 0), -1)
+        cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
+        
+        cv2.rectangle(frame, (frame.shape[1]//2 - 100, frame.shape[0]//2 - 30), 
+                    (frame.shape[1]//2 + 100, frame.shape[0]//2 + 30), 
+                    (255, 255, 255), -1)
+        cv2.rectangle(frame, (frame.shape[1]//2 - 100, frame.shape[0]//2 - 30), 
+                    (frame.shape[1]//2 + 100, frame.shape[0]//2 + 30), 
+                    (0, 0, 0), 2)
+        
+        cv2.putText(frame, "Enter threshold value:", 
+                  (frame.shape[1]//2 - 100, frame.shape[0]//2 - 40), 
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        
+        display_text = input_text
+        input_counter = (input_counter + 1) % 30
+        if input_counter < 15:
+            display_text += "|"
+        
+        cv2.putText(frame, display_text, 
+                  (frame.shape[1]//2 - 50, frame.shape[0]//2 + 5), 
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+        
+        cv2.putText(frame, "Press Enter to confirm, Esc to cancel", 
+                  (frame.shape[1]//2 - 140, frame.shape[0]//2 + 50), 
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    
+    # Draw naming input field if active
+    elif naming_mode:
+        overlay = frame.copy()
+        cv2.rectangle(overlay, (0, 0), (frame.shape[1], frame.shape[0]), (0, 0, 0), -1)
+        cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
+        
+        cv2.rectangle(frame, (frame.shape[1]//2 - 150, frame.shape[0]//2 - 30), 
+                    (frame.shape[1]//2 + 150, frame.shape[0]//2 + 30), 
+                    (255, 255, 255), -1)
+        cv2.rectangle(frame, (frame.shape[1]//2 - 150, frame.shape[0]//2 - 30), 
+                    (frame.shape[1]//2 + 150, frame.shape[0]//2 + 30), 
+                    (0, 0, 0), 2)
+        
+        cv2.putText(frame, "Name this threshold:", 
+                  (frame.shape[1]//2 - 100, frame.shape[0]//2 - 40), 
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        
+        display_name = name_input
+        name_counter = (name_counter + 1) % 30
+        if name_counter < 15:
+            display_name += "|"
+        
+        cv2.putText(frame, display_name, 
+                  (frame.shape[1]//2 - 140, frame.shape[0]//2 + 5), 
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+        
+        cv2.putText(frame, "Press Enter to save, Esc to cancel", 
+                  (frame.shape[1]//2 - 140, frame.shape[0]//2 + 50), 
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
     
-    if session_duration > 0:
-        blink_frequency = total_blinks / (session_duration / 60)  # blinks per minute
+    # Draw edit input field if active
+    elif edit_mode:
+        overlay = frame.copy()
+        cv2.rectangle(overlay, (0, 0), (frame.shape[1], frame.shape[0]), (0, 0, 0), -1)
+        cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
+        
+        cv2.rectangle(frame, (frame.shape[1]//2 - 100, frame.shape[0]//2 - 30), 
+                    (frame.shape[1]//2 + 100, frame.shape[0]//2 + 30), 
+                    (255, 255, 255), -1)
+        cv2.rectangle(frame, (frame.shape[1]//2 - 100, frame.shape[0]//2 - 30), 
+                    (frame.shape[1]//2 + 100, frame.shape[0]//2 + 30), 
+                    (0, 0, 0), 2)
+        
+        cv2.putText(frame, f"Edit {edit_threshold_name}:", 
+                  (frame.shape[1]//2 - 100, frame.shape[0]//2 - 40), 
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        
+        display_edit = edit_input
+        edit_counter = (edit_counter + 1) % 30
+        if edit_counter < 15:
+            display_edit += "|"
+        
+        cv2.putText(frame, display_edit, 
+                  (frame.shape[1]//2 - 50, frame.shape[0]//2 + 5), 
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+        
+        cv2.putText(frame, "Press Enter to save, Esc to cancel", 
+                  (frame.shape[1]//2 - 140, frame.shape[0]//2 + 50), 
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    
+    # Draw threshold selection menu if open
+    elif threshold_menu_open:
+        menu_buttons = draw_threshold_menu(frame)
+        button_params['menu_buttons'] = menu_buttons
     else:
-        blink_frequency = 0
-    return blink_frequency
+        button_params['menu_buttons'] = []  # Clear menu buttons when menu is closed
+    
+    # Display current threshold info
+    threshold_text = f"Threshold: {current_threshold} ({truncate_text(current_threshold_name, 15)})"
+    cv2.putText(frame, threshold_text, 
+              (10, frame.shape[0] - 60), cv2.FONT_HERSHEY_SIMPLEX, 
+              0.6, (0, 0, 0), 2)
+    
+    # Display sleepiness percentage
+    sleep_percentage = engine.sleep_percentage
+    percentage_color = (0, 255, 0) if sleep_percentage < 30 else (0, 165, 255) if sleep_percentage < 60 else (0, 0, 255)
+    cv2.putText(frame, f"Sleepiness: {sleep_percentage:.1f}%", 
+              (frame.shape[1] - 220, 30), cv2.FONT_HERSHEY_SIMPLEX, 
+              0.6, percentage_color, 2)
+    trend_text = "/".join(f"{engine.trend_percentages[label]:.0f}" for label in TREND_WINDOWS_SEC)
+    cv2.putText(frame, f"{'/'.join(TREND_WINDOWS_SEC)}: {trend_text}%", 
+              (frame.shape[1] - 220, 55), cv2.FONT_HERSHEY_SIMPLEX, 
+              0.5, (0, 0, 0), 1)
+    if calibrator is not None:
+        cv2.putText(frame, f"Calibrating: {calibrator.remaining(time.perf_counter()):.0f}s left", 
+                  (frame.shape[1] - 220, 80), cv2.FONT_HERSHEY_SIMPLEX, 
+                  0.5, (255, 0, 0), 1)
+    
+    # Display head pose
+    cv2.putText(frame, f"Head: P:{engine.pitch:.1f} Y:{engine.yaw:.1f} R:{engine.roll:.1f}", 
+              (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+    
+    # Display blink rate
+    cv2.putText(frame, f"Blink Rate: {engine.blink_rate:.1f}/min", 
+              (10, 130), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+
+    # Display glass-to-alert latency and frames dropped by the pipeline
+    cv2.putText(frame, f"Latency: {pipeline_latency_ms:.0f} ms  Dropped: {dropped}", 
+              (10, 160), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+
+    # Per-stage timing summary (refreshed once per second)
+    for i, line in enumerate(telemetry.overlay_lines()):
+        cv2.putText(frame, line, (10, 185 + 20 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 1)
+
+
+def headless_commands(quit_event):
+    """
+    Threshold control on stdin when there is no window:
+    '+' / '-' step by 0.01, a number sets it, 'load <name>' applies a preset, 'q' quits.
+    """
+    for line in sys.stdin:
+        cmd = line.strip()
+        if cmd == 'q':
+            quit_event.set()
+            return
+        elif cmd in ('+', '-'):
+            set_threshold(max(0.01, current_threshold + (0.01 if cmd == '+' else -0.01)), current_threshold_name)
+        elif cmd.startswith('load '):
+            apply_saved_threshold(cmd[5:].strip())
+        elif cmd:
+            try:
+                set_threshold(cmd)
+            except ValueError:
+                log.info("Commands: + | - | <value> | load <name> | q")
 
-def main():
+def main(headless=False, camera=0, record=None, record_half=False, calibrate=False, manual_threshold=False):
+    """
+    calibrate: recalibrate this driver even if a profile is stored
+    manual_threshold: a threshold was chosen on the command line, don't replace it
+    """
+    try:
+        run_session(headless, camera, record, record_half, calibrate, manual_threshold)
+    finally:
+        # Also after an early return (camera won't open) or a setup error: the status
+        # segment is closed and unlinked, pending files are written, the log is flushed
+        threshold_store.close()
+        status_publisher.close()
+        telemetry.close()
+        shutdown_logging()
+
+def run_session(headless, camera, record, record_half, calibrate, manual_threshold):
+    """Detector session from opening the camera to the session summary (see main)"""
+    global calibrator
+    log_handler = start_logging()
 
     if not os.path.exists(JSON_FILE_PATH):
         with open(JSON_FILE_PATH, "w") as f:
             json.dump([], f)
 
-    # Load saved thresholds
-    load_thresholds()
+    # Load saved thresholds (unless --threshold-name already did)
+    if not threshold_store.loaded:
+        load_thresholds()
+
+    # Open the shared-memory status segment (JSON stays as a fallback sink)
+    try:
+        status_publisher.channel = StatusChannelWriter(channel_name(VEHICLE_INFO["id"]))
+    except OSError as e:
+        log.warning(f"Shared-memory status channel unavailable: {e}")
+    if INGEST_URL:
+        status_publisher.ingest = HttpStatusSink(INGEST_URL)
     
     # Initialize webcam
-    video_capture = cv2.VideoCapture(0)
+    video_capture = cv2.VideoCapture(camera)
     
     if not video_capture.isOpened():
-        print_with_counter("Error: Could not open video capture device")
+        log.error("Could not open video capture device")
+        video_capture.release()
         return
 
+    alert_dispatcher = create_alert_dispatcher()
+
+    # Stored calibration for this driver, or calibrate during the first CALIBRATION_SEC
+    driver_id = VEHICLE_INFO["id"]
+    calibration_store = CalibrationStore(CALIBRATION_FILE)
+    profile = calibration_store.get(driver_id)
+    if profile and not calibrate and not manual_threshold:
+        apply_calibration(profile)
+        log.info(f"- Calibration for '{driver_id}': threshold {current_threshold}, drowsy band {drowsy_band}")
+    elif CALIBRATION_SEC > 0 and (calibrate or not manual_threshold):
+        calibrator = EarCalibrator(CALIBRATION_SEC)
+        log.info(f"- Calibrating '{driver_id}' over the first {CALIBRATION_SEC:.0f}s: keep eyes open and look ahead")
+
+    # Landmark trace for replay_trace.py (every processed frame, with its timestamp)
+    trace_writer = None
+    if record:
+        trace_writer = TraceWriter(record,
+                                   int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                                   int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                                   video_capture.get(cv2.CAP_PROP_FPS) or 0.0,
+                                   point_dtype=np.float16 if record_half else np.float32)
+        log.info(f"- Recording landmark trace to {record}")
+
     # Welcome message
-    clear_terminal()
-    print_with_counter("=== Drowsiness Detection System Started ===")
-    print_with_counter("- Terminal will auto-clear after 50 messages")
-    print_with_counter("- Press 'q' to quit the application")
-    print_with_counter(f"- Loaded {len(saved_thresholds)} saved thresholds")
-
-    # Create named window and set mouse callback
-    cv2.namedWindow('Real-Time Eye State Detection')
+    log.info("=== Drowsiness Detection System Started ===")
+    log.info(f"- Logging to {LOG_FILE}")
+    log.info(f"- Loaded {len(threshold_store)} saved thresholds")
+
     button_params = {'inc_btn': None, 'dec_btn': None, 'input_btn': None, 
                    'save_btn': None, 'load_btn': None, 'menu_buttons': []}
-    cv2.setMouseCallback('Real-Time Eye State Detection', handle_mouse_click, button_params)
+    quit_event = threading.Event()
+    if headless:
+        # No window, no overlays: thresholds come from the CLI / stdin commands
+        log.info("- Headless mode: type '+', '-', a value, 'load <name>' or 'q' + Enter")
+        threading.Thread(target=headless_commands, args=(quit_event,), daemon=True).start()
+    else:
+        log.info("- Press 'q' to quit the application")
+        # Create named window and set mouse callback
+        cv2.namedWindow('Real-Time Eye State Detection')
+        cv2.setMouseCallback('Real-Time Eye State Detection', handle_mouse_click, button_params)
 
-    # Add these globals if not already present
-    global input_text, input_counter, input_mode, naming_mode, name_input, name_counter
-    global edit_mode, edit_threshold_name, edit_input, edit_counter, threshold_menu_open
     global edit_mode, edit_threshold_name, edit_input, edit_counter
-    global sleep, drowsy, active, status, color, box_color
-    global blink_duration, total_blinks, last_blink_time, blink_frequency
-    global microsleep_counter, session_start_time, head_pose_angles
+    global pipeline_latency_ms
     edit_mode = False
     edit_threshold_name = ""
     edit_input = ""
@@ -749,245 +857,94 @@ def main():
     current_state_start = None
     # ==========================================
 
+    # Capture and Face Mesh run on their own threads; this loop is the render/UI stage
+    engine.reset()  # session clock starts with capture
+    pipeline = FramePipeline(video_capture, create_face_mesh(), scheduler=inference_scheduler,
+                             telemetry=telemetry).start()
+
     try:
-        while True:
-            # Read frame from webcam
-            ret, frame = video_capture.read()
-            if not ret:
-                raise RuntimeError("Failed to read frame from webcam")
-            if not ret:
-                print_with_counter("Error: Could not read frame")
-                break
-            
-            # Process frame
-            frame = cv2.flip(frame, 1)
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = face_mesh.process(rgb_frame)
-
-            # Draw threshold adjustment buttons
-            btn_width, btn_height = 80, 40
-            inc_btn = draw_button(frame, "Thresh+", (10, frame.shape[0] - 50), btn_width, btn_height)
-            dec_btn = draw_button(frame, "Thresh-", (100, frame.shape[0] - 50), btn_width, btn_height)
-            input_btn = draw_button(frame, "Custom", (190, frame.shape[0] - 50), btn_width, btn_height)
-            save_btn = draw_button(frame, "Save", (280, frame.shape[0] - 50), btn_width, btn_height)
-            load_btn = draw_button(frame, "Load", (370, frame.shape[0] - 50), btn_width, btn_height)
-
-            button_params['inc_btn'] = inc_btn
-            button_params['dec_btn'] = dec_btn
-            button_params['input_btn'] = input_btn
-            button_params['save_btn'] = save_btn
-            button_params['load_btn'] = load_btn
-            
-            # Draw custom input field if active
-            if input_mode:
-                overlay = frame.copy()
-                cv2.rectangle(overlay, (0, 0), (frame.shape[1], frame.shape[0]), (0, 0, 0), -1)
-                cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
-                
-                cv2.rectangle(frame, (frame.shape[1]//2 - 100, frame.shape[0]//2 - 30), 
-                            (frame.shape[1]//2 + 100, frame.shape[0]//2 + 30), 
-                            (255, 255, 255), -1)
-                cv2.rectangle(frame, (frame.shape[1]//2 - 100, frame.shape[0]//2 - 30), 
-                            (frame.shape[1]//2 + 100, frame.shape[0]//2 + 30), 
-                            (0, 0, 0), 2)
-                
-                cv2.putText(frame, "Enter threshold value:", 
-                          (frame.shape[1]//2 - 100, frame.shape[0]//2 - 40), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                
-                display_text = input_text
-                input_counter = (input_counter + 1) % 30
-                if input_counter < 15:
-                    display_text += "|"
-                
-                cv2.putText(frame, display_text, 
-                          (frame.shape[1]//2 - 50, frame.shape[0]//2 + 5), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
-                
-                cv2.putText(frame, "Press Enter to confirm, Esc to cancel", 
-                          (frame.shape[1]//2 - 140, frame.shape[0]//2 + 50), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            # Draw naming input field if active
-            elif naming_mode:
-                overlay = frame.copy()
-                cv2.rectangle(overlay, (0, 0), (frame.shape[1], frame.shape[0]), (0, 0, 0), -1)
-                cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
-                
-                cv2.rectangle(frame, (frame.shape[1]//2 - 150, frame.shape[0]//2 - 30), 
-                            (frame.shape[1]//2 + 150, frame.shape[0]//2 + 30), 
-                            (255, 255, 255), -1)
-                cv2.rectangle(frame, (frame.shape[1]//2 - 150, frame.shape[0]//2 - 30), 
-                            (frame.shape[1]//2 + 150, frame.shape[0]//2 + 30), 
-                            (0, 0, 0), 2)
-                
-                cv2.putText(frame, "Name this threshold:", 
-                          (frame.shape[1]//2 - 100, frame.shape[0]//2 - 40), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                
-                display_name = name_input
-                name_counter = (name_counter + 1) % 30
-                if name_counter < 15:
-                    display_name += "|"
-                
-                cv2.putText(frame, display_name, 
-                          (frame.shape[1]//2 - 140, frame.shape[0]//2 + 5), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
-                
-                cv2.putText(frame, "Press Enter to save, Esc to cancel", 
-                          (frame.shape[1]//2 - 140, frame.shape[0]//2 + 50), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            # Draw edit input field if active
-            elif edit_mode:
-                overlay = frame.copy()
-                cv2.rectangle(overlay, (0, 0), (frame.shape[1], frame.shape[0]), (0, 0, 0), -1)
-                cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
-                
-                cv2.rectangle(frame, (frame.shape[1]//2 - 100, frame.shape[0]//2 - 30), 
-                            (frame.shape[1]//2 + 100, frame.shape[0]//2 + 30), 
-                            (255, 255, 255), -1)
-                cv2.rectangle(frame, (frame.shape[1]//2 - 100, frame.shape[0]//2 - 30), 
-                            (frame.shape[1]//2 + 100, frame.shape[0]//2 + 30), 
-                            (0, 0, 0), 2)
-                
-                cv2.putText(frame, f"Edit {edit_threshold_name}:", 
-                          (frame.shape[1]//2 - 100, frame.shape[0]//2 - 40), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                
-                display_edit = edit_input
-                edit_counter = (edit_counter + 1) % 30
-                if edit_counter < 15:
-                    display_edit += "|"
-                
-                cv2.putText(frame, display_edit, 
-                          (frame.shape[1]//2 - 50, frame.shape[0]//2 + 5), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
-                
-                cv2.putText(frame, "Press Enter to save, Esc to cancel", 
-                          (frame.shape[1]//2 - 140, frame.shape[0]//2 + 50), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            # Draw threshold selection menu if open
-            elif threshold_menu_open:
-                menu_buttons = draw_threshold_menu(frame)
-                button_params['menu_buttons'] = menu_buttons
-            else:
-                button_params['menu_buttons'] = []  # Clear menu buttons when menu is closed
-            
-            # Display current threshold info
-            threshold_text = f"Threshold: {current_threshold} ({truncate_text(current_threshold_name, 15)})"
-            cv2.putText(frame, threshold_text, 
-                      (10, frame.shape[0] - 60), cv2.FONT_HERSHEY_SIMPLEX, 
-                      0.6, (0, 0, 0), 2)
-            
-            # Display sleepiness percentage
-            percentage_color = (0, 255, 0) if sleep_percentage < 30 else (0, 165, 255) if sleep_percentage < 60 else (0, 0, 255)
-            cv2.putText(frame, f"Sleepiness: {sleep_percentage:.1f}%", 
-                      (frame.shape[1] - 220, 30), cv2.FONT_HERSHEY_SIMPLEX, 
-                      0.6, percentage_color, 2)
-            
-            # Display head pose
-            cv2.putText(frame, f"Head: P:{head_pose_angles['pitch']:.1f} Y:{head_pose_angles['yaw']:.1f} R:{head_pose_angles['roll']:.1f}", 
-                      (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
-            
-            # Display blink rate
-            cv2.putText(frame, f"Blink Rate: {blink_frequency:.1f}/min", 
-                      (10, 130), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+        while not quit_event.is_set():
+            # Newest frame that has already been through Face Mesh
+            packet = pipeline.read(timeout=1.0)
+            if packet is None:
+                if pipeline.error or pipeline.stopped:
+                    # Detection has stopped: don't leave the last status published as live
+                    write_vehicle_status("Not running", engine.sleep_percentage)
+                    raise RuntimeError(pipeline.error or "Frame pipeline stopped")
+                # Keep the window responsive while waiting on the camera
+                if not headless and cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+                continue
+
+            frame = packet["frame"]
+            results = packet["results"]
+            render_started = time.perf_counter()
+
+            if not headless:
+                draw_controls(frame, button_params, pipeline.dropped)
+            render_ms = (time.perf_counter() - render_started) * 1000
 
             if results.multi_face_landmarks:
                 for face_landmarks in results.multi_face_landmarks:
                     # Get frame dimensions and face bounding box
                     h, w, _ = frame.shape
-                    face_points = np.array([(landmark.x * w, landmark.y * h) for landmark in face_landmarks.landmark])
-                    
-                    # Calculate bounding box coordinates with padding
-                    padding = 20
-                    x_min = max(0, int(np.min(face_points[:, 0])) - padding)  # Add closing parenthesis
-                    y_min = max(0, int(np.min(face_points[:, 1])) - padding)  # Add closing parenthesis
-                    x_max = min(w, int(np.max(face_points[:, 0])) + padding)  # Add closing parenthesis
-                    y_max = min(h, int(np.max(face_points[:, 1])) + padding)  # Add closing parenthesis
+                    analysis_started = time.perf_counter()
+                    # Capture time (monotonic): durations are measured between frames as they
+                    # were taken, unaffected by processing delay or wall-clock adjustments
+                    now = packet["captured_at"]
+                    engine.threshold = current_threshold  # may have been changed from the UI
+                    engine.step(face_landmarks, now, w, h, packet["roi"])
+                    telemetry["analysis"].since(analysis_started)
+                    if trace_writer is not None:
+                        trace_writer.write(now, engine.landmarks.normalized)
+                    ear = engine.ear
+                    status = engine.status
+                    sleep_percentage = engine.sleep_percentage
+                    if calibrator is not None and calibrator.add(ear, now):
+                        finish_calibration(calibration_store, driver_id)
+                    if inference_scheduler is not None:
+                        # EAR near the threshold → back to full rate
+                        inference_scheduler.observe(ear, current_threshold, status,
+                                                    engine.landmarks.bounding_box(w, h, padding=0))
                     
-                    # Extract eye coordinates
-                    left_eye = np.array([(face_landmarks.landmark[i].x * w, face_landmarks.landmark[i].y * h) 
-                                      for i in [33, 160, 158, 133, 153, 144]])
-                    right_eye = np.array([(face_landmarks.landmark[i].x * w, face_landmarks.landmark[i].y * h) 
-                                       for i in [362, 385, 387, 263, 373, 380]])
-                    
-                    # Calculate EAR
-                    left_ear = eye_aspect_ratio(left_eye)
-                    right_ear = eye_aspect_ratio(right_eye)
-                    ear = (left_ear + right_ear) / 2.0
-                    
-                    # Calculate head pose
-                    head_pose_angles = calculate_head_pose(face_landmarks, w, h)
-                    
-                    # Blink detection
-                    current_time = time.time()
-                    is_eye_closed = ear < current_threshold
-                    if is_eye_closed:
-                        blink_duration += 1
-                        if blink_duration == 1:  # Start of blink
-                            if current_time - last_blink_time > 0.5:  # Valid blink (not continuation)
-                                total_blinks += 1
-                                last_blink_time = current_time
+                    if engine.microsleep_ms_ended:
+                        log.warning("Microsleep detected! Duration: %d ms", engine.microsleep_ms_ended)
+                    # Queued for the alert thread only when due (escalation / cooldown)
+                    if engine.alert:
+                        alert_dispatcher.alert()   # wall-clock time for the sinks
                     else:
-                        if blink_duration > 0:  # End of blink
-                            if blink_duration > MICROSLEEP_FRAMES:
-                                microsleep_counter += 1
-                                print_with_counter(f"Microsleep detected! Duration: {blink_duration} frames")
-                        blink_duration = 0
-                    
-                    # Update blink rate
-                    calculate_blink_rate()
+                        alert_dispatcher.clear()
                     
-                    # Display current EAR value
-                    cv2.putText(frame, f"EAR: {ear:.2f}", 
-                              (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 
-                              0.6, (0, 0, 0), 2)
-                    
-                    # Use the adjustable threshold for detection
-                    old_status = status
-                    if ear < current_threshold:
-                        sleep += 1
-                        drowsy = active = 0
-                        if sleep > CONSEC_FRAMES:
-                            status = "SLEEPING !!!"
-                            color = (0, 0, 255)
-                            box_color = (0, 0, 255)
-                            threading.Thread(target=play_ALEART).start()
-                    elif current_threshold <= ear < current_threshold + 0.04:
-                        drowsy += 1
-                        sleep = active = 0
-                        if drowsy > CONSEC_FRAMES:
-                            status = "Drowsy !"
-                            color = (255, 0, 255)
-                            box_color = (255, 0, 255)
-                    else:
-                        active += 1
-                        sleep = drowsy = 0
-                        if active > CONSEC_FRAMES:
-                            status = "Active :)"
-                            color = (0, 255, 0)
-                            box_color = (0, 255, 0)
-
                     # ===== UPDATE STATE HISTORY ONLY ON CHANGE =====
-                    if status and old_status != status:
-                        print_with_counter(f"Status changed to: {status} (EAR: {ear:.2f})")
+                    if engine.status_changed:
+                        log.info("Status changed to: %s (EAR: %.2f)", status, ear)
                         update_state_history(status)
 
-                    # 1. Update sleep percentage based on the new status
-                    update_sleep_percentage(status) # Ensure percentage is fresh
-                    
+                    # 1. Sleep percentage was refreshed by engine.step
                     # 2. Now write the current status AND the calculated percentage to JSON
+                    publish_started = time.perf_counter()
                     write_vehicle_status(status, sleep_percentage) # <--- UPDATED CALL
+                    telemetry["publish"].since(publish_started)
+                    pipeline_latency_ms = telemetry["latency"].since(packet["captured_at"])
                     
                     # Alert when sleepiness is high
                     if sleep_percentage > 50 and sleep_percentage % 10 < 0.1:
-                        print_with_counter(f"WARNING: Sleepiness at {sleep_percentage:.1f}%!")
+                        log.warning("Sleepiness at %.1f%%!", sleep_percentage)
+
+                    if headless:
+                        continue
+
+                    # Display current EAR value
+                    cv2.putText(frame, f"EAR: {ear:.2f}", 
+                              (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 
+                              0.6, (0, 0, 0), 2)
+
+                    # Calculate bounding box coordinates with padding
+                    x_min, y_min, x_max, y_max = engine.landmarks.bounding_box(w, h, padding=20)
 
                     # Draw rectangle around face
-                    cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), box_color, 2)
+                    color = STATUS_COLORS.get(status, (0, 0, 0))
+                    cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), color, 2)
 
                     # Display status with background
                     text_size = cv2.getTextSize(status, cv2.FONT_HERSHEY_SIMPLEX, 1, 3)[0]
@@ -996,28 +953,46 @@ def main():
                     
             else:
                 # Print message if no face is detected
-                cv2.putText(frame, "No face detected", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                if not headless:
+                    cv2.putText(frame, "No face detected", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
                 
                 # Reset counters =when no face
-                sleep = drowsy = active = 0
-                status = ""
-                blink_duration = 0  # Reset blink duration
+                engine.no_face()
+                alert_dispatcher.clear()
+                if trace_writer is not None:
+                    trace_writer.write(packet["captured_at"], None)
+                if inference_scheduler is not None:
+                    inference_scheduler.observe(0.0, current_threshold, None, None)
+
+            telemetry.dropped = pipeline.dropped
+            telemetry.counters["status_publishes"] = status_publisher.publishes
+            telemetry.counters["json_writes"] = status_publisher.flushes
+            telemetry.frame_done()
+            if headless:
+                continue
 
             # Display frame
+            show_started = time.perf_counter()
             cv2.imshow('Real-Time Eye State Detection', frame)
 
             # Check for key presses
             key = cv2.waitKey(5) & 0xFF
+            telemetry["render"].add(render_ms + (time.perf_counter() - show_started) * 1000)
             
             # Handle keyboard input
             handle_keyboard_input(key)
             
             # Quit on 'q'
             if key == ord('q'):
-                print_with_counter("Quitting application...")
-                write_vehicle_status("Not running", sleep_percentage)
                 break
 
+        log.info("Quitting application...")
+        write_vehicle_status("Not running", engine.sleep_percentage)
+
+    except KeyboardInterrupt:
+        log.info("Quitting application...")
+        write_vehicle_status("Not running", engine.sleep_percentage)
+
     finally:
         # ===== NEW: Finalize state history =====
         if current_state is not None:
@@ -1033,18 +1008,29 @@ def main():
         # ======================================
         
         # Session summary
-        session_duration = time.time() - session_start_time
-        final_blink_rate = calculate_blink_rate()
+        session_duration = time.perf_counter() - engine.session_start
+        total_blinks = engine.total_blinks
+        microsleep_counter = engine.microsleep_count
+        sleep_percentage = engine.sleep_percentage
+        final_blink_rate = total_blinks / (session_duration / 60) if session_duration > 0 else 0
         recommendation = "Take a break and rest if possible." if sleep_percentage > 50 or microsleep_counter >= 10 else "Continue monitoring if driving or performing critical tasks."
         
-        print_with_counter("=== Session Summary ===")
-        print_with_counter(f"Duration: {session_duration/60:.1f} minutes")
-        print_with_counter(f"Total Blinks: {total_blinks}")
-        print_with_counter(f"Average Blink Rate: {final_blink_rate:.1f} blinks/minute")
-        print_with_counter(f"Microsleep Episodes: {microsleep_counter}")
-        print_with_counter(f"Final Sleepiness: {sleep_percentage:.1f}%")
-        print_with_counter(f"Final Recommendation: {recommendation}")
-        print_with_counter("=== Application terminated ===")
+        log.info("=== Session Summary ===")
+        log.info(f"Duration: {session_duration/60:.1f} minutes")
+        log.info(f"Total Blinks: {total_blinks}")
+        log.info(f"Average Blink Rate: {final_blink_rate:.1f} blinks/minute")
+        log.info(f"Microsleep Episodes: {microsleep_counter}")
+        log.info(f"Frames Dropped by Pipeline: {pipeline.dropped}")
+        for name, t in telemetry.snapshot()["stages"].items():
+            log.info(f"  {name}: p50 {t['p50']:.1f} / p95 {t['p95']:.1f} / p99 {t['p99']:.1f} ms")
+        if inference_scheduler is not None:
+            log.info(f"Face Mesh Runs: {inference_scheduler.inferred} "
+                               f"(reused on {inference_scheduler.skipped} frames)")
+        log.info(f"Final Sleepiness: {sleep_percentage:.1f}%")
+        log.info(f"Final Recommendation: {recommendation}")
+        log.info(f"Log Records Suppressed: {log_handler.filters[0].suppressed} "
+                 f"(dropped on full queue: {log_handler.dropped})")
+        log.info("=== Application terminated ===")
         
         # Save session summary to HTML file
         if not os.path.exists('session'):
@@ -1484,8 +1470,39 @@ def main():
 """)
         
         # Clean up
+        alert_dispatcher.close()
+        pipeline.stop()
         video_capture.release()
-        cv2.destroyAllWindows()
+        if trace_writer is not None:
+            trace_writer.close()
+            log.info(f"Landmark trace: {trace_writer.frames} frames → {record}")
+        if not headless:
+            cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Real-time driver drowsiness detection")
+    parser.add_argument('--headless', action='store_true',
+                        help='No window or overlays (in-vehicle units); control via stdin')
+    parser.add_argument('--camera', type=int, default=0, help='Camera index (default: 0)')
+    parser.add_argument('--threshold', type=float, help='EAR threshold to start with')
+    parser.add_argument('--threshold-name', help='Saved threshold preset to start with')
+    parser.add_argument('--driver', help=f'Driver id for calibration and status (default: {VEHICLE_INFO["id"]})')
+    parser.add_argument('--calibrate', action='store_true',
+                        help="Recalibrate this driver's threshold even if one is stored")
+    parser.add_argument('--record', metavar='TRACE', help='Record landmarks to a .slt trace for replay_trace.py')
+    parser.add_argument('--record-half', action='store_true', help='Store trace points as float16 (half the size)')
+    args = parser.parse_args()
+
+    start_logging()
+    if args.threshold_name:
+        load_thresholds()
+        apply_saved_threshold(args.threshold_name)
+    elif args.threshold is not None:
+        set_threshold(args.threshold)
+
+    if args.driver:
+        VEHICLE_INFO["id"] = args.driver
+
+    main(headless=args.headless, camera=args.camera, record=args.record, record_half=args.record_half,
+         calibrate=args.calibrate, manual_threshold=bool(args.threshold_name) or args.threshold is not None)
@@ -0,0 +1,210 @@
+"""
+Shared-memory status channel: detector → dashboard / Arduino bridge
+A fixed-layout struct in a multiprocessing.shared_memory segment guarded by a
+sequence counter (seqlock): odd while the writer is mid-update, even when stable.
+Readers poll the counter and unpack only when it moved — no file I/O, no JSON parsing.
+Each vehicle id has its own segment (channel_name), so several detectors can share a host.
+The writer only bumps the counter when the status or percentage changed, or as a heartbeat.
+"""
+
+import re
+import struct
+import time
+from datetime import datetime
+from multiprocessing import shared_memory
+
+CHANNEL_PREFIX = "sleepx_"
+
+MAGIC = b"SLPX"
+VERSION = 2
+
+# magic, version, flags, sequence, generation (creation time in ns, new per detector run)
+HEADER = struct.Struct("<4sHHQQ")
+FLAGS_OFFSET = 6
+SEQ_OFFSET = 8
+GENERATION_OFFSET = 16
+FLAG_CLOSED = 1  # set by the writer just before it unlinks the segment
+# last_update (epoch s), sleep_percentage, frame counter, id, name, type, status
+PAYLOAD = struct.Struct("<dfI32s32s16s32s")
+SEGMENT_SIZE = HEADER.size + PAYLOAD.size
+
+_SEQ = struct.Struct("<Q")
+_FLAGS = struct.Struct("<H")
+
+
+def channel_name(vehicle_id):
+    """Segment name for one vehicle (short enough for macOS' 31-character limit)"""
+    return CHANNEL_PREFIX + re.sub(r"[^A-Za-z0-9_-]", "_", str(vehicle_id))[:23]
+
+
+def _encode(text, size):
+    return text.encode("utf-8")[:size]
+
+
+def _decode(raw):
+    return raw.rstrip(b"\x00").decode("utf-8", errors="replace")
+
+
+def _untrack(shm):
+    """Stop this process's resource tracker from unlinking a segment it doesn't own"""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+class StatusChannelWriter:
+    """Owned by the detector; one segment per vehicle id"""
+
+    HEARTBEAT_SEC = 1.0  # refresh last_update this often even if nothing changed
+
+    def __init__(self, name):
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=SEGMENT_SIZE)
+        except FileExistsError:
+            # Left behind by a crashed detector for this vehicle: take it over
+            self._shm = shared_memory.SharedMemory(name=name, create=False)
+        self.name = name
+        self._buf = self._shm.buf
+        self._seq = 0
+        self._frame = 0
+        self._last = None
+        self._last_write = 0.0
+        HEADER.pack_into(self._buf, 0, MAGIC, VERSION, 0, self._seq, time.time_ns())
+
+    def write(self, vehicle_info, state, percentage):
+        """Publish if the status or rounded percentage changed (or for the heartbeat); returns True if written"""
+        current = (state, round(percentage, 1))
+        now = time.monotonic()
+        if current == self._last and now - self._last_write < self.HEARTBEAT_SEC:
+            return False
+        self._last = current
+        self._last_write = now
+        self._frame = (self._frame + 1) & 0xFFFFFFFF
+        self._seq += 1  # odd: update in progress
+        _SEQ.pack_into(self._buf, SEQ_OFFSET, self._seq)
+        PAYLOAD.pack_into(
+            self._buf, HEADER.size,
+            time.time(), float(percentage), self._frame,
+            _encode(vehicle_info["id"], 32), _encode(vehicle_info["name"], 32),
+            _encode(vehicle_info["type"], 16), _encode(state, 32))
+        self._seq += 1  # even: stable
+        _SEQ.pack_into(self._buf, SEQ_OFFSET, self._seq)
+        return True
+
+    def close(self):
+        # Readers still mapping this segment see the flag and reattach by name
+        _FLAGS.pack_into(self._buf, FLAGS_OFFSET, FLAG_CLOSED)
+        self._buf = None
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class StatusChannelReader:
+    """
+    Attaches lazily; read() returns a dict shaped like a JSON vehicle entry or None.
+    A closed segment (detector exited) or one whose counter stopped moving for longer than
+    STALE_REATTACH_SEC (crash, restart) is dropped and the name is opened again.
+    """
+
+    RETRY_ATTACH_SEC = 1.0
+    STALE_REATTACH_SEC = 5.0  # several writer heartbeats
+
+    def __init__(self, name):
+        self.name = name
+        self._shm = None
+        self._next_attach = 0.0
+        self._generation = None
+        self._last_seq = None
+        self._last_entry = None
+        self._seen_seq = None
+        self._seen_at = 0.0
+
+    def _attach(self):
+        now = time.monotonic()
+        if now < self._next_attach:
+            return False
+        self._next_attach = now + self.RETRY_ATTACH_SEC
+        try:
+            shm = shared_memory.SharedMemory(name=self.name, create=False)
+        except (FileNotFoundError, OSError):
+            return False
+        _untrack(shm)
+        if shm.size < SEGMENT_SIZE or bytes(shm.buf[:4]) != MAGIC:
+            shm.close()
+            return False
+        magic, version, flags, seq, generation = HEADER.unpack_from(shm.buf)
+        if version != VERSION or flags & FLAG_CLOSED:
+            shm.close()
+            return False
+        self._shm = shm
+        self._generation = generation
+        self._seen_seq = seq
+        self._seen_at = now
+        return True
+
+    @property
+    def attached(self):
+        return self._shm is not None or self._attach()
+
+    def version(self):
+        """(generation, sequence): a cheap change check that also changes on a detector restart; None if not attached"""
+        if not self.attached:
+            return None
+        buf = self._shm.buf
+        seq = _SEQ.unpack_from(buf, SEQ_OFFSET)[0]
+        now = time.monotonic()
+        if seq != self._seen_seq:
+            self._seen_seq = seq
+            self._seen_at = now
+        elif _FLAGS.unpack_from(buf, FLAGS_OFFSET)[0] & FLAG_CLOSED or now - self._seen_at > self.STALE_REATTACH_SEC:
+            # Writer gone: its successor (if any) created a new segment under the same name
+            self.close()
+            self._next_attach = 0.0
+            if not self._attach():
+                return None
+            seq = self._seen_seq
+        return self._generation, seq
+
+    def sequence(self):
+        """Current sequence number, None if not attached"""
+        version = self.version()
+        return None if version is None else version[1]
+
+    def read(self, retries=100):
+        if self.version() is None:
+            return None
+        buf = self._shm.buf
+        for _ in range(retries):
+            seq1 = _SEQ.unpack_from(buf, SEQ_OFFSET)[0]
+            if seq1 == 0:
+                return None  # writer hasn't published yet
+            if seq1 == self._last_seq:
+                return self._last_entry
+            if seq1 & 1:
+                continue
+            fields = PAYLOAD.unpack_from(buf, HEADER.size)
+            if _SEQ.unpack_from(buf, SEQ_OFFSET)[0] != seq1:
+                continue  # torn read, try again
+            last_update, percentage, frame, vid, name, vtype, state = fields
+            self._last_seq = seq1
+            self._last_entry = {
+                "id": _decode(vid),
+                "name": _decode(name),
+                "type": _decode(vtype),
+                "status": _decode(state),
+                "sleep_percentage": round(percentage, 1),
+                "last_update": datetime.fromtimestamp(last_update).isoformat()
+            }
+            return self._last_entry
+        return self._last_entry
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+            self._last_seq = self._last_entry = None
@@ -0,0 +1,188 @@
+"""
+In-memory vehicle status with coalesced, atomic JSON flushes
+The detector hands every frame to the shared-memory channel (if any); the JSON file
+is an optional compatibility sink, only rewritten when something changed
+(immediately for a status change, at most every flush_interval for percentage drift)
+or as a heartbeat, always via temp file + rename so readers never see torn JSON.
+The read-merge-write runs on a background thread, so the frame loop never waits on the disk.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from latest_queue import LatestQueue
+
+log = logging.getLogger(__name__)
+
+
+def atomic_write_json(path, data, fsync=True, **dump_kwargs):
+    """
+    Write JSON to a temp file in the same directory, then rename it over path.
+    The rename alone keeps readers from seeing torn JSON; fsync=True also makes the new
+    content survive a power cut (for settings, not for status rewritten every second).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, **dump_kwargs)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_json_list(path):
+    """Load a JSON list from path, [] if missing or invalid"""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+    return data if isinstance(data, list) else []
+
+
+class HttpStatusSink:
+    """Posts the newest entry to the dashboard's /api/ingest from a background thread"""
+
+    def __init__(self, url, timeout=2.0):
+        self.url = url
+        self.timeout = timeout
+        self.posts = 0
+        self.errors = 0
+        self._queue = LatestQueue(1)  # only the newest entry matters
+        self._thread = threading.Thread(target=self._run, name="status-ingest", daemon=True)
+        self._thread.start()
+
+    def send(self, entry):
+        self._queue.put(dict(entry))
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break  # closed
+            request = urllib.request.Request(
+                self.url, data=json.dumps(entry).encode("utf-8"),
+                headers={"Content-Type": "application/json"}, method="POST")
+            try:
+                urllib.request.urlopen(request, timeout=self.timeout).close()
+                self.posts += 1
+            except (urllib.error.URLError, OSError) as e:
+                self.errors += 1
+                log.debug(f"Status ingest to {self.url} failed: {e}")
+
+    def close(self, timeout=2.0):
+        self._queue.close()
+        self._thread.join(timeout)
+
+
+class StatusPublisher:
+    """Keeps this vehicle's entry in memory and flushes it to the shared JSON file"""
+
+    def __init__(self, path, vehicle_info, flush_interval=0.5, heartbeat_interval=5.0,
+                 channel=None, write_json=True, ingest=None):
+        self.path = path
+        self.vehicle_info = vehicle_info
+        self.channel = channel                        # status_channel.StatusChannelWriter or None
+        self.write_json = write_json
+        self.ingest = ingest                          # HttpStatusSink or None
+        self.flush_interval = flush_interval          # max write rate for percentage changes
+        self.heartbeat_interval = heartbeat_interval  # refresh last_update even if nothing changed
+        self.entry = None
+        self.flushes = 0       # file writes completed
+        self.publishes = 0
+        self._dirty = False
+        self._last_flush = 0.0
+        self._writes = LatestQueue(1)  # only the newest entry needs writing
+        self._writer = None
+
+    def publish(self, state, percentage):
+        """Record the latest state; returns True if it was flushed (queued for the file / ingest API)"""
+        self.publishes += 1
+        if self.channel is not None:
+            self.channel.write(self.vehicle_info, state, percentage)
+        if not self.write_json and self.ingest is None:
+            return False
+        percentage = round(percentage, 1)
+        previous = self.entry
+        status_changed = previous is None or previous["status"] != state
+
+        if status_changed or previous["sleep_percentage"] != percentage:
+            self.entry = {
+                "id": self.vehicle_info["id"],
+                "name": self.vehicle_info["name"],
+                "type": self.vehicle_info["type"],
+                "status": state,                   # exact string shown on screen
+                "sleep_percentage": percentage,
+                "last_update": datetime.now().isoformat()
+            }
+            self._dirty = True
+
+        now = time.monotonic()
+        elapsed = now - self._last_flush
+        if status_changed or (self._dirty and elapsed >= self.flush_interval):
+            return self.flush()
+        if elapsed >= self.heartbeat_interval:
+            self.entry["last_update"] = datetime.now().isoformat()
+            return self.flush()
+        return False
+
+    def flush(self):
+        """Post the entry to the ingest API and queue the file merge for the writer thread"""
+        if self.entry is None:
+            return False
+        if self.ingest is not None:
+            self.ingest.send(self.entry)
+        if self.write_json:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="status-json", daemon=True)
+                self._writer.start()
+            self._writes.put(dict(self.entry))
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        return True
+
+    def _run(self):
+        while True:
+            entry = self._writes.get()
+            if entry is None:
+                break  # closed
+            # Merge into the shared file: other drivers' entries are kept
+            data = [d for d in read_json_list(self.path) if d.get("id") != entry["id"]]
+            data.append(entry)
+            try:
+                atomic_write_json(self.path, data, fsync=False, indent=2)
+            except OSError as e:
+                # e.g. Windows refuses the rename while a reader holds the file; retry on the next publish
+                log.warning(f"Status flush failed: {e}")
+                self._dirty = True
+                continue
+            self.flushes += 1
+
+    def close(self, timeout=2.0):
+        if self._dirty:
+            self.flush()
+        if self._writer is not None:
+            self._writes.close()   # queued entries are still written before the thread exits
+            self._writer.join(timeout)
+            self._writer = None
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+        if self.ingest is not None:
+            self.ingest.close()
+            self.ingest = None
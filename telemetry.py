@@ -0,0 +1,134 @@
+"""
+Per-stage latency and FPS telemetry for the detection loop
+Each stage keeps its last samples in a fixed ring buffer (one writer thread per stage, a
+float store per frame); percentiles are computed only when a snapshot is taken (~1 Hz).
+Snapshots go to the overlay and to a small JSON file served by the dashboard's metrics
+endpoints; the file is written by a background thread so the render loop never touches disk.
+"""
+
+import logging
+import threading
+import time
+
+import numpy as np
+
+from latest_queue import LatestQueue
+from status_store import atomic_write_json
+
+log = logging.getLogger(__name__)
+
+# capture: camera read | inference: flip + convert + Face Mesh | analysis: EAR/pose/state logic
+# publish: status write | render: overlay + imshow + waitKey | latency: capture → status decided
+STAGES = ("capture", "inference", "analysis", "publish", "render", "latency")
+PERCENTILES = (50, 95, 99)
+
+
+class StageTimes:
+    """Ring buffer of the last `size` durations (ms) for one stage"""
+
+    def __init__(self, size=512):
+        self._samples = np.zeros(size, dtype=np.float64)
+        self._head = 0
+        self.count = 0      # total samples ever recorded
+
+    def add(self, ms):
+        self._samples[self._head] = ms
+        self._head = (self._head + 1) % len(self._samples)
+        self.count += 1
+
+    def since(self, started):
+        """Record perf_counter() - started; returns the duration in ms"""
+        ms = (time.perf_counter() - started) * 1000
+        self.add(ms)
+        return ms
+
+    def summary(self):
+        filled = self._samples[:min(self.count, len(self._samples))]
+        if not len(filled):
+            return None
+        p = np.percentile(filled, PERCENTILES)
+        out = {f"p{q}": round(float(v), 2) for q, v in zip(PERCENTILES, p)}
+        out["mean"] = round(float(filled.mean()), 2)
+        out["count"] = self.count
+        return out
+
+
+class Telemetry:
+    """Stage timers plus frame / drop counters for one detector"""
+
+    def __init__(self, path=None, interval=1.0, window=512):
+        self.path = path            # JSON snapshot for the dashboard, None to keep it in-process
+        self.interval = interval    # seconds between snapshots
+        self.stages = {name: StageTimes(window) for name in STAGES}
+        self.frames = 0
+        self.dropped = 0            # set by the owner (e.g. FramePipeline.dropped)
+        self.counters = {}          # other running totals set by the owner, e.g. {"json_writes": n}
+        self.latest = None          # last snapshot dict
+        self._fps_mark = (time.perf_counter(), 0)
+        self._next_snapshot = time.perf_counter() + interval
+        self._writes = LatestQueue(1)   # only the newest snapshot is worth writing
+        self._writer = None
+
+    def __getitem__(self, stage):
+        return self.stages[stage]
+
+    def frame_done(self):
+        """Count one processed frame; takes (and writes) a snapshot once per interval"""
+        self.frames += 1
+        now = time.perf_counter()
+        if now >= self._next_snapshot:
+            self._next_snapshot = now + self.interval
+            self.snapshot(now)
+
+    def snapshot(self, now=None):
+        now = time.perf_counter() if now is None else now
+        mark_time, mark_frames = self._fps_mark
+        elapsed = now - mark_time
+        fps = (self.frames - mark_frames) / elapsed if elapsed > 0 else 0.0
+        self._fps_mark = (now, self.frames)
+        self.latest = {
+            "timestamp": time.time(),
+            "fps": round(fps, 1),
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "counters": dict(self.counters),
+            "stages": {name: s.summary() for name, s in self.stages.items() if s.count}
+        }
+        if self.path:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="telemetry", daemon=True)
+                self._writer.start()
+            self._writes.put(self.latest)
+        return self.latest
+
+    def _run(self):
+        while True:
+            snap = self._writes.get()
+            if snap is None:
+                break  # closed
+            try:
+                # Rewritten every second and only read live: no fsync needed
+                atomic_write_json(self.path, snap, fsync=False)
+            except OSError as e:
+                log.debug(f"Telemetry write failed: {e}")
+
+    def close(self, timeout=2.0):
+        """Write the last queued snapshot and stop the writer"""
+        if self._writer is not None:
+            self._writes.close()
+            self._writer.join(timeout)
+            self._writer = None
+
+    def overlay_lines(self):
+        """Short text lines for the video overlay (empty until the first snapshot)"""
+        snap = self.latest
+        if not snap:
+            return []
+        stages = snap["stages"]
+        parts = [f"{name[:3]} {stages[name]['p50']:.0f}/{stages[name]['p95']:.0f}"
+                 for name in STAGES[:-1] if name in stages]
+        lines = [f"FPS {snap['fps']:.1f}  drops {snap['dropped']}  (p50/p95 ms)", "  ".join(parts)]
+        if "latency" in stages:
+            lat = stages["latency"]
+            lines.append(f"latency p50 {lat['p50']:.0f}  p95 {lat['p95']:.0f}  p99 {lat['p99']:.0f} ms")
+        return lines
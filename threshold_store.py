@@ -0,0 +1,194 @@
+"""
+Saved EAR thresholds with an in-memory index and debounced, atomic persistence
+Entries live in one OrderedDict keyed by lowercased name and kept in least-recently-used
+order, so lookups, "recently used" and the menu's most-recent-first listing don't scan
+or sort. A change only marks the store dirty. A background thread writes the file once
+changes have stopped for flush_delay seconds (temp file + rename), so UI actions never
+wait on the disk.
+File format (unchanged): {"thresholds": [{"name", "value", "last_used"}, ...]}
+"""
+
+import json
+import logging
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from status_store import atomic_write_json
+
+log = logging.getLogger(__name__)
+
+
+def _key(name):
+    return name.strip().lower()
+
+
+class ThresholdRepository:
+    """Named thresholds: get/put/edit/delete by name in O(1), newest-first listing, lazy saves"""
+
+    def __init__(self, path, default_value, max_recent=5, flush_delay=1.0):
+        self.path = path
+        self.default_value = default_value
+        self.max_recent = max_recent
+        self.flush_delay = flush_delay    # quiet time before a burst of changes is written
+        self.loaded = False
+        self.writes = 0
+        self._entries = OrderedDict()     # lowercased name → entry, oldest use first
+        self._newest_first = None         # cached listing, rebuilt after a change
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._changed = threading.Event()
+        self._closing = False
+        self._thread = None
+
+    # --- loading and lookups ---
+
+    def load(self):
+        """
+        Read the file; returns the entry count. A missing or empty file is seeded with a single
+        Default entry. An unreadable one gets Default in memory only and is backed up to
+        <path>.invalid, so the user's presets are not silently overwritten.
+        """
+        seed_file = True
+        try:
+            with open(self.path, "r") as f:
+                text = f.read()
+            data = json.loads(text) if text.strip() else []
+            items = data.get("thresholds", []) if isinstance(data, dict) else data
+            if not isinstance(items, list):
+                raise TypeError(f"expected a list of thresholds, got {type(items).__name__}")
+            entries = [{"name": str(t["name"]), "value": float(t["value"]),
+                        "last_used": t.get("last_used", "1970-01-01")} for t in items] or None
+        except FileNotFoundError:
+            entries = None
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            log.error(f"Error loading thresholds from {self.path}: {e}; using Default")
+            entries = None
+            seed_file = False
+            try:
+                shutil.copyfile(self.path, self.path + ".invalid")
+            except OSError as copy_error:
+                log.warning(f"Backing up {self.path} failed: {copy_error}")
+
+        with self._lock:
+            self._entries.clear()
+            self._newest_first = None
+            self.loaded = True
+            if entries is None:
+                self.put("Default", self.default_value)
+                # Seeded files are written; an unreadable one stays as it is until the next save
+                self._dirty = seed_file
+            else:
+                for entry in sorted(entries, key=lambda t: t["last_used"]):
+                    self._entries[_key(entry["name"])] = entry
+            return len(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return _key(name) in self._entries
+
+    def get(self, name):
+        return self._entries.get(_key(name))
+
+    def newest_first(self):
+        """All entries, most recently used first (cached between changes)"""
+        listing = self._newest_first
+        if listing is None:
+            with self._lock:
+                listing = self._newest_first = tuple(reversed(self._entries.values()))
+        return listing
+
+    def recently_used(self, count=None):
+        return self.newest_first()[:self.max_recent if count is None else count]
+
+    # --- changes (each one schedules a write) ---
+
+    def touch(self, name):
+        """Mark a threshold as just used; returns the entry or None"""
+        with self._lock:
+            entry = self._entries.get(_key(name))
+            if entry is not None:
+                self._use(entry)
+            return entry
+
+    def put(self, name, value):
+        """Save or overwrite a threshold; returns (entry, created)"""
+        with self._lock:
+            entry = self._entries.get(_key(name))
+            created = entry is None
+            if created:
+                entry = self._entries[_key(name)] = {"name": name, "value": value}
+            else:
+                entry["value"] = value
+            self._use(entry)
+            return entry, created
+
+    def edit(self, name, value):
+        """Change an existing threshold's value; returns the entry or None"""
+        with self._lock:
+            entry = self._entries.get(_key(name))
+            if entry is not None:
+                entry["value"] = value
+                self._use(entry)
+            return entry
+
+    def delete(self, name):
+        """Remove a threshold; returns the removed entry or None"""
+        with self._lock:
+            entry = self._entries.pop(_key(name), None)
+            if entry is not None:
+                self._changed_listing()
+            return entry
+
+    def _use(self, entry):
+        entry["last_used"] = datetime.now().isoformat()
+        self._entries.move_to_end(_key(entry["name"]))
+        self._changed_listing()
+
+    def _changed_listing(self):
+        self._newest_first = None
+        self._dirty = True
+        if self._thread is None and not self._closing:
+            self._thread = threading.Thread(target=self._run, name="threshold-store", daemon=True)
+            self._thread.start()
+        self._changed.set()
+
+    # --- persistence ---
+
+    def _run(self):
+        while not self._closing:
+            self._changed.wait()
+            self._changed.clear()
+            # Debounce: a burst of clicks / key presses becomes one write
+            while not self._closing and self._changed.wait(self.flush_delay):
+                self._changed.clear()
+            self.flush()
+
+    def flush(self):
+        """Write the file now if anything changed; returns True if it was written"""
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return False
+                data = {"thresholds": [dict(t) for t in self._entries.values()]}
+                self._dirty = False
+            try:
+                atomic_write_json(self.path, data, indent=2)
+            except OSError as e:
+                log.warning(f"Saving thresholds to {self.path} failed: {e}")
+                self._dirty = True
+                return False
+            self.writes += 1
+            return True
+
+    def close(self, timeout=2.0):
+        """Stop the writer and save any pending change"""
+        self._closing = True
+        self._changed.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
@@ -1,10 +1,126 @@
-from flask import Flask, jsonify, render_template
+from flask import Flask, jsonify, render_template, Response, request
 import json
 from datetime import datetime
 import os
+import sys
+import threading
+import time
+
+# Shared modules live in the project root (one level up from web/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from status_channel import StatusChannelReader, channel_name
+from fleet_store import FleetStore, normalize_entry
+import metrics_exposition
+
 app = Flask(__name__)
 # Assuming your JSON file is in a folder named 'JSON'
 PATH = os.path.join('JSON','sleep_detection_data.json')
+# Detector telemetry snapshot (per-stage latency percentiles, FPS, drops), rewritten ~1 Hz
+METRICS_PATH = os.path.join('JSON','detector_metrics.json')
+# Arduino bridge (IoT/display.py) counters, rewritten ~1 Hz
+DISPLAY_METRICS_PATH = os.path.join('JSON','display_metrics.json')
+METRICS_STALE_SEC = 5.0
+
+# Live status straight from each local detector's shared-memory segment, merged over the
+# JSON file (which lists every local vehicle). Segments are per vehicle id: the ids below
+# plus every id found in the file get a reader.
+LOCAL_VEHICLE_IDS = ['driver1']
+status_readers = {}  # vehicle id -> StatusChannelReader
+
+def reader_for(vid):
+    reader = status_readers.get(vid)
+    if reader is None:
+        reader = status_readers[vid] = StatusChannelReader(channel_name(vid))
+    return reader
+
+for _vid in LOCAL_VEHICLE_IDS:
+    reader_for(_vid)
+
+def load_vehicles():
+    """JSON vehicle list with live shared-memory entries merged in (raises FileNotFoundError if there is neither)"""
+    try:
+        with open(PATH) as f:
+            data = json.load(f)
+        vehicles = data if isinstance(data, list) else []
+    except FileNotFoundError:
+        vehicles = None
+    for v in vehicles or []:
+        if isinstance(v, dict) and isinstance(v.get('id'), str) and v['id']:
+            reader_for(v['id'])
+    live = {}
+    for vid, reader in list(status_readers.items()):
+        entry = reader.read()
+        if entry is not None:
+            live[vid] = dict(entry)
+    if vehicles is None and not live:
+        raise FileNotFoundError(PATH)
+    # Entries without an id are kept as-is; normalize_entry rejects them later
+    merged = [live.pop(v.get('id'), v) if isinstance(v, dict) else v for v in vehicles or []]
+    return merged + list(live.values())
+
+# --- Fleet store ---
+# Every vehicle lives in an indexed in-memory store with incremental counters, fed by
+# POST /api/ingest (remote detectors) and by the local detector's shared memory / JSON
+# file. The local source is re-parsed only when its identity changes: a shared-memory
+# (generation, sequence), or the file's (mtime, size, inode).
+fleet = FleetStore()
+# change_seq restarts at 0 with the process, so ETags also carry a per-process token;
+# a tag cached before a restart can never match a new one
+ETAG_GENERATION = f"{time.time_ns():x}"
+_local = {'key': None, 'ids': set()}
+_local_lock = threading.Lock()
+
+def source_key():
+    """Cheap identity of the local data (raises FileNotFoundError if there is none)"""
+    live = []
+    for vid, reader in list(status_readers.items()):
+        version = reader.version()
+        if version is not None and version[1]:
+            live.append((vid, version))
+    live = tuple(live)
+    try:
+        st = os.stat(PATH)
+    except FileNotFoundError:
+        if not live:
+            raise
+        return ('shm', live)
+    return ('file', st.st_mtime_ns, st.st_size, st.st_ino, live)
+
+def sync_local_sources():
+    """Fold the local detector's vehicles into the fleet store, once per source change"""
+    # The lock also serializes the status readers, which the poller and request threads share
+    with _local_lock:
+        try:
+            key = source_key()
+        except FileNotFoundError:
+            key = None
+        if key == _local['key']:
+            return
+        entries = []
+        if key is not None:
+            try:
+                raw = load_vehicles()
+            except (FileNotFoundError, json.JSONDecodeError):
+                return  # mid-replace or gone; retry on the next call
+            for v in raw if isinstance(raw, list) else []:
+                try:
+                    entries.append(normalize_entry(v))
+                except ValueError:
+                    continue
+        _local['key'] = key
+        ids = {e['id'] for e in entries}
+        fleet.remove_many(_local['ids'] - ids)
+        fleet.upsert_many(entries)
+        _local['ids'] = ids
+
+def load_snapshot():
+    """(vehicles, stats, etag); raises FileNotFoundError when there is no data at all"""
+    sync_local_sources()
+    if _local['key'] is None and not len(fleet):
+        raise FileNotFoundError(PATH)
+    # ETag follows status / percentage / membership changes, not per-frame last_update refreshes
+    vehicles, stats, change_seq = fleet.snapshot()
+    return vehicles, stats, f"fleet-{ETAG_GENERATION}-{change_seq:x}"
 
 # --- Helper Function to Process Data and Stats ---
 # The function now takes an optional 'error_state' argument.
@@ -58,9 +174,7 @@ def calculate_stats(data_list, error_state=False):
 @app.route('/')
 def index():
     try:
-        with open(PATH) as f:
-            data = json.load(f)
-        stats = calculate_stats(data)
+        data, stats, _ = load_snapshot()
         # Pass both 'vehicles' (the list) and 'stats' (the object)
         return render_template('dashboard.html', vehicles=data, stats=stats)
     except FileNotFoundError:
@@ -72,18 +186,19 @@ def index():
 
 
 # This route serves fresh data for the AJAX polling in the front-end
+# ETag / If-None-Match: unchanged data is answered with an empty 304
 @app.route('/api/data')
 def get_data():
     try:
-        with open(PATH) as f:
-            data = json.load(f)
-        stats = calculate_stats(data)
+        data, stats, etag = load_snapshot()
         
         # Return the full payload expected by the JavaScript updateDashboard function
-        return jsonify({
+        response = jsonify({
             "vehicles": data,
             "stats": stats
         })
+        response.set_etag(etag)
+        return response.make_conditional(request)
     except FileNotFoundError:
         # If the JSON file is not found, return an error payload
         stats = calculate_stats([], error_state=True)
@@ -92,5 +207,118 @@ def get_data():
             "stats": stats
         })
 
+# --- Fleet ingestion ---
+
+# Detector instances POST one status entry (or a list of them) here
+@app.route('/api/ingest', methods=['POST'])
+def ingest():
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({"error": "expected a JSON body"}), 400
+    updates = payload if isinstance(payload, list) else [payload]
+    try:
+        entries = [normalize_entry(u) for u in updates]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    changed = fleet.upsert_many(entries)
+    return jsonify({"accepted": len(entries), "changed": changed})
+
+# --- Detector telemetry ---
+
+def load_metrics_snapshot(path):
+    """Latest telemetry snapshot at path plus its age; None if it was never written"""
+    try:
+        with open(path) as f:
+            metrics = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    age = time.time() - metrics.get('timestamp', 0)
+    metrics['age_sec'] = round(age, 1)
+    metrics['stale'] = age > METRICS_STALE_SEC
+    return metrics
+
+# Where the frame budget goes: p50/p95/p99 per stage, effective FPS and dropped frames
+@app.route('/api/metrics')
+def get_metrics():
+    metrics = load_metrics_snapshot(METRICS_PATH)
+    if metrics is None:
+        return jsonify({"error": f"no detector telemetry at {METRICS_PATH}"}), 404
+    return jsonify(metrics)
+
+# Prometheus scrape target: fleet status, detector telemetry and Arduino bridge counters
+@app.route('/metrics')
+def prometheus_metrics():
+    try:
+        vehicles, stats, _ = load_snapshot()
+    except FileNotFoundError:
+        vehicles, stats = [], fleet.stats()
+    out = metrics_exposition.Exposition()
+    metrics_exposition.fleet_metrics(out, vehicles, stats)
+    metrics_exposition.detector_metrics(out, load_metrics_snapshot(METRICS_PATH))
+    metrics_exposition.display_metrics(out, load_metrics_snapshot(DISPLAY_METRICS_PATH))
+    return Response(out.render(), mimetype=metrics_exposition.CONTENT_TYPE)
+
+# --- Server-Sent Events ---
+
+STREAM_POLL_SEC = 0.05       # how often the local detector source is checked
+STREAM_KEEPALIVE_SEC = 15.0  # comment line so proxies don't drop idle streams
+
+_poller = {'thread': None}
+_poller_lock = threading.Lock()
+
+def poll_local_sources():
+    while True:
+        try:
+            sync_local_sources()
+        except Exception:
+            # A bad file must not end local updates for every SSE client; retry next poll
+            app.logger.exception("Syncing local vehicle sources failed")
+        time.sleep(STREAM_POLL_SEC)
+
+def start_local_poller():
+    """One background thread folds local changes into the store; SSE clients wait on the store"""
+    with _poller_lock:
+        if _poller['thread'] is None:
+            _poller['thread'] = threading.Thread(target=poll_local_sources, name="local-source-poller", daemon=True)
+            _poller['thread'].start()
+
+def sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def snapshot_event():
+    try:
+        vehicles, stats, _ = load_snapshot()
+    except FileNotFoundError:
+        vehicles, stats = [], calculate_stats([], error_state=True)
+    return sse('snapshot', {"vehicles": vehicles, "stats": stats})
+
+# Push stream replacing the 2 s /api/data polling: one full snapshot, then deltas only
+# when a driver's status or sleep_percentage actually changed. Idle clients block on the
+# store's Condition, so they cost nothing between changes.
+@app.route('/api/stream')
+def stream():
+    start_local_poller()
+
+    def events():
+        seq = fleet.change_seq
+        yield snapshot_event()
+
+        while True:
+            new_seq = fleet.wait_for_change(seq, STREAM_KEEPALIVE_SEC)
+            if new_seq == seq:
+                yield ": keep-alive\n\n"
+                continue
+            delta = fleet.changes_since(seq)
+            if delta is None:
+                # Fell too far behind the change log: resync with a full snapshot
+                seq = fleet.change_seq
+                yield snapshot_event()
+                continue
+            seq, changed, removed = delta
+            yield sse('delta', {"vehicles": changed, "removed": removed, "stats": fleet.stats()})
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True, threaded=True)
\ No newline at end of file
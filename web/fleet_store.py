@@ -0,0 +1,169 @@
+"""
+In-memory fleet status store for the dashboard
+Vehicles are indexed by id and the active/sleeping/by_type counters are updated
+incrementally on every upsert, so serving stats is O(1) regardless of fleet size.
+"""
+
+import math
+import threading
+from collections import deque
+from datetime import datetime
+
+VEHICLE_TYPES = ('car', 'truck')
+CHANGE_LOG_SIZE = 4096  # recent status/percentage changes kept for incremental pushes
+
+
+def signature(vehicle):
+    """The fields whose change is worth pushing to the dashboard"""
+    return (vehicle.get('status'), vehicle.get('sleep_percentage'))
+
+
+def classify(vehicle):
+    """'active', 'sleeping', or None for non-monitoring states (not running / not available)"""
+    status_lower = str(vehicle.get('status', '')).lower()
+    if 'not running' in status_lower or 'not available' in status_lower:
+        return None
+    return 'active' if 'active' in status_lower else 'sleeping'
+
+
+def normalize_entry(raw):
+    """Validate an ingested status update; raises ValueError on bad input"""
+    if not isinstance(raw, dict):
+        raise ValueError("status update must be a JSON object")
+    vid = raw.get('id')
+    if not isinstance(vid, str) or not vid:
+        raise ValueError("status update needs a non-empty string 'id'")
+    pct = raw.get('sleep_percentage', 0)
+    # bool is an int subclass, and NaN / Infinity would be serialized as invalid JSON
+    if isinstance(pct, bool) or not isinstance(pct, (int, float)) or not math.isfinite(pct):
+        raise ValueError(f"'sleep_percentage' for {vid} must be a finite number")
+    return {
+        'id': vid,
+        'name': str(raw.get('name', vid)),
+        'type': str(raw.get('type', 'car')).lower(),
+        'status': str(raw.get('status', '')),
+        'sleep_percentage': round(min(100.0, max(0.0, float(pct))), 1),
+        'last_update': str(raw.get('last_update') or datetime.now().isoformat())
+    }
+
+
+class FleetStore:
+    """Thread-safe vehicle index with incremental counters"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.version = 0        # bumps on any change, including last_update only (list cache)
+        self.change_seq = 0     # bumps only on status/percentage changes, add or remove (ETag, push)
+        self._log = deque(maxlen=CHANGE_LOG_SIZE)  # (change_seq, id)
+        self._vehicles = {}   # id -> entry
+        self._class = {}      # id -> (classify(entry), type) as currently counted
+        self._active = 0
+        self._sleeping = 0
+        self._by_type = {t: 0 for t in VEHICLE_TYPES}
+        self._list_cache = (None, [])
+
+    def __len__(self):
+        return len(self._vehicles)
+
+    def _count(self, key, sign):
+        bucket, vtype = key
+        if bucket == 'active':
+            self._active += sign
+            # by_type counts ACTIVE vehicles only, like calculate_stats
+            if vtype in self._by_type:
+                self._by_type[vtype] += sign
+        elif bucket == 'sleeping':
+            self._sleeping += sign
+
+    def _log_change(self, vid):
+        self.change_seq += 1
+        self._log.append((self.change_seq, vid))
+
+    def _upsert_locked(self, entry):
+        vid = entry['id']
+        old = self._vehicles.get(vid)
+        if old == entry:
+            return False
+        if old is None or signature(old) != signature(entry):
+            self._log_change(vid)
+        old_key = self._class.get(vid)
+        if old_key is not None:
+            self._count(old_key, -1)
+        new_key = (classify(entry), entry.get('type', '').lower())
+        self._count(new_key, +1)
+        self._class[vid] = new_key
+        self._vehicles[vid] = entry
+        return True
+
+    def upsert_many(self, entries):
+        """Insert/replace entries; returns how many actually changed"""
+        with self.cond:
+            changed = sum(self._upsert_locked(e) for e in entries)
+            if changed:
+                self.version += 1
+                self.cond.notify_all()
+            return changed
+
+    def upsert(self, entry):
+        return self.upsert_many([entry]) == 1
+
+    def remove_many(self, ids):
+        with self.cond:
+            removed = 0
+            for vid in ids:
+                if self._vehicles.pop(vid, None) is not None:
+                    self._count(self._class.pop(vid), -1)
+                    self._log_change(vid)
+                    removed += 1
+            if removed:
+                self.version += 1
+                self.cond.notify_all()
+            return removed
+
+    def stats(self):
+        """Same shape as app.calculate_stats, from the running counters"""
+        with self.cond:
+            return {
+                'total_vehicles': len(self._vehicles),
+                'active': self._active,
+                'sleeping': self._sleeping,
+                'by_type': dict(self._by_type),
+                'system_status': 'Running'
+            }
+
+    def snapshot(self):
+        """
+        (vehicles list, stats, change_seq); the list is rebuilt at most once per version.
+        change_seq ignores last_update-only refreshes, so it makes a stable ETag.
+        """
+        with self.cond:
+            version, vehicles = self._list_cache
+            if version != self.version:
+                vehicles = list(self._vehicles.values())
+                self._list_cache = (self.version, vehicles)
+            return vehicles, self.stats(), self.change_seq
+
+    def changes_since(self, seq):
+        """
+        (change_seq, changed entries, removed ids) since change_seq == seq,
+        or None when the change log no longer reaches back that far.
+        """
+        with self.cond:
+            if seq == self.change_seq:
+                return seq, [], []
+            if not self._log or self._log[0][0] > seq + 1:
+                return None
+            ids = set()
+            for s, vid in reversed(self._log):
+                if s <= seq:
+                    break
+                ids.add(vid)
+            changed = [self._vehicles[vid] for vid in ids if vid in self._vehicles]
+            removed = [vid for vid in ids if vid not in self._vehicles]
+            return self.change_seq, changed, removed
+
+    def wait_for_change(self, seen_seq, timeout):
+        """Block until change_seq moves past seen_seq (or timeout); returns change_seq"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.change_seq != seen_seq, timeout)
+            return self.change_seq
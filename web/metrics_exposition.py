@@ -0,0 +1,113 @@
+"""
+Prometheus text exposition (format 0.0.4) for fleet and detector health
+Built by hand from data the dashboard already holds (fleet store, detector telemetry
+snapshot, Arduino bridge counters), so scraping needs no extra dependency.
+"""
+
+import math
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _value(value):
+    """Sample value at full precision: integers exactly, floats via repr (large counters stay exact)"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+class Exposition:
+    """Collects metric families and renders them; HELP/TYPE are written once per family"""
+
+    def __init__(self):
+        self._lines = []
+        self._declared = set()
+
+    def add(self, metric, value, help_text, kind='gauge', labels=None):
+        if value is None:
+            return
+        if metric not in self._declared:
+            self._declared.add(metric)
+            self._lines.append(f'# HELP {metric} {help_text}')
+            self._lines.append(f'# TYPE {metric} {kind}')
+        self._lines.append(f'{metric}{_labels(labels)} {_value(value)}')
+
+    def render(self):
+        return '\n'.join(self._lines) + '\n'
+
+
+def fleet_metrics(out, vehicles, stats):
+    """Per-vehicle sleep percentage plus the dashboard's status counts"""
+    for v in vehicles:
+        out.add('sleepx_vehicle_sleep_percentage', v.get('sleep_percentage'),
+                'Rolling sleepiness score of the driver (0-100)',
+                labels={'id': v.get('id', ''), 'name': v.get('name', ''), 'type': v.get('type', '')})
+    for v in vehicles:
+        out.add('sleepx_vehicle_status', 1, 'Current status string of each vehicle (always 1)',
+                labels={'id': v.get('id', ''), 'status': v.get('status', '')})
+    out.add('sleepx_vehicles', stats['total_vehicles'], 'Vehicles known to the dashboard')
+    out.add('sleepx_vehicles_active', stats['active'], 'Monitored vehicles whose driver is active')
+    out.add('sleepx_vehicles_sleeping', stats['sleeping'], 'Monitored vehicles whose driver is drowsy or sleeping')
+    for vtype, count in stats['by_type'].items():
+        out.add('sleepx_vehicles_active_by_type', count, 'Active vehicles per vehicle type',
+                labels={'type': vtype})
+
+
+def detector_metrics(out, snapshot):
+    """Local detector telemetry (telemetry.Telemetry snapshot); up=0 when missing or stale"""
+    up = snapshot is not None and not snapshot.get('stale')
+    out.add('sleepx_detector_up', int(up), 'Detector telemetry is present and fresh')
+    if snapshot is None:
+        return
+    out.add('sleepx_detector_fps', snapshot.get('fps'), 'Effective processed frames per second')
+    out.add('sleepx_detector_frames_total', snapshot.get('frames'), 'Frames processed', 'counter')
+    out.add('sleepx_detector_dropped_frames_total', snapshot.get('dropped'),
+            'Frames dropped because a pipeline stage was busy', 'counter')
+    for stage, t in snapshot.get('stages', {}).items():
+        if not t:
+            continue
+        for q in ('50', '95', '99'):
+            out.add('sleepx_detector_stage_latency_ms', t.get('p' + q),
+                    'Per-stage duration percentiles over the recent window',
+                    labels={'stage': stage, 'quantile': f'{int(q) / 100:g}'})
+    for stage, t in snapshot.get('stages', {}).items():
+        if t:
+            out.add('sleepx_detector_stage_samples_total', t.get('count'),
+                    'Per-stage timing samples recorded', 'counter',
+                    labels={'stage': stage})
+    counters = snapshot.get('counters', {})
+    out.add('sleepx_detector_json_writes_total', counters.get('json_writes'),
+            'Status JSON file flushes', 'counter')
+    out.add('sleepx_detector_status_publishes_total', counters.get('status_publishes'),
+            'Status updates published (shared memory / coalesced JSON)', 'counter')
+
+
+def display_metrics(out, snapshot):
+    """Arduino bridge (IoT/display.py) counters; up=0 when missing or stale"""
+    up = snapshot is not None and not snapshot.get('stale')
+    out.add('sleepx_display_up', int(up), 'Arduino bridge counters are present and fresh')
+    if snapshot is None:
+        return
+    out.add('sleepx_display_serial_writes_total', snapshot.get('serial_writes'),
+            'Commands written to the Arduino', 'counter')
+    out.add('sleepx_display_serial_bytes_total', snapshot.get('serial_bytes'),
+            'Bytes written to the Arduino', 'counter')
+    out.add('sleepx_display_source_reads_total', snapshot.get('source_reads'),
+            'Status reads triggered by a source change', 'counter')
+    out.add('sleepx_display_percentage', snapshot.get('displayed_percentage'),
+            'Smoothed percentage currently shown on the LEDs')